@@ -1,7 +1,8 @@
 from flask import Flask, redirect, url_for
 from flask_login import LoginManager, current_user
+from sqlalchemy.engine import make_url
 from config import Config
-from models import db, User
+from models import db
 import os
 import config
 
@@ -10,20 +11,48 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    db_path = app.config["SQLALCHEMY_DATABASE_URI"].replace("sqlite:///", "")
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    if not os.path.exists(db_path):
-        open(db_path, "a").close()
+    # Chỉ SQLite cần tạo sẵn thư mục/file database
+    db_url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if db_url.get_backend_name() == "sqlite" and db_url.database not in (None, "", ":memory:"):
+        db_path = db_url.database
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        if not os.path.exists(db_path):
+            open(db_path, "a").close()
 
     db.init_app(app)
 
+    from services.engine import configure_engine
+    with app.app_context():
+        configure_engine(app)
+
+    from services.order_version import register_order_versioning
+    register_order_versioning()
+
+    from services.versions import init_version_store
+    init_version_store(app)
+
+    from services.availability import register_availability_versioning
+    register_availability_versioning()
+
+    from services.jobs import init_job_worker
+    init_job_worker(app)
+
+    from services.chat_cache import init_response_cache
+    init_response_cache(app)
+
+    from services.assets import register_asset_helpers
+    register_asset_helpers(app)
+
+    from services.images import register_image_helpers
+    register_image_helpers(app)
+
     login_manager = LoginManager()
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    # Người dùng đăng nhập được cache trong process (services/user_cache.py), không SELECT mỗi request
+    from services.user_cache import load_user
+    login_manager.user_loader(load_user)
 
     from routes import auth, customer, employee, admin, chatbot
     app.register_blueprint(auth.bp)
@@ -32,13 +61,14 @@ def create_app():
     app.register_blueprint(admin.bp)
     app.register_blueprint(chatbot.bp)
 
-    with app.app_context():
-        db.create_all()
+    from commands import register_commands
+    register_commands(app)
 
-        if User.query.count() == 0:
-            from seed_data import seed_database
-            seed_database()
-            print("Da tao du lieu mau thanh cong!")
+    # Tạo bảng/dữ liệu mẫu qua `flask init-db` và `flask seed`; AUTO_INIT_DB=true để làm mỗi lần khởi động như trước
+    if app.config["AUTO_INIT_DB"]:
+        from services.schema import init_database
+        with app.app_context():
+            init_database(seed=True)
 
     @app.route("/")
     def index():
@@ -56,4 +86,11 @@ def create_app():
 if __name__ == "__main__":
 
     app = create_app()
+
+    # Chạy trực tiếp khi phát triển: tự tạo database và dữ liệu mẫu nếu chưa có
+    from services.schema import init_database
+    with app.app_context():
+        if init_database(seed=True)[1]:
+            print("Da tao du lieu mau thanh cong!")
+
     app.run(debug=True)
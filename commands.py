@@ -0,0 +1,98 @@
+"""
+CLI Commands
+Các lệnh quản trị chạy qua `flask --app app <lệnh>`
+"""
+import click
+
+
+def register_commands(app):
+    """Đăng ký các lệnh CLI vào app"""
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Tạo bảng còn thiếu và thêm cột/index mới (chạy khi triển khai, trước khi khởi động web)"""
+        from services.schema import init_database
+
+        added, _ = init_database()
+        click.echo('Da tao/cap nhat database.')
+        for column in added:
+            click.echo(f'Them cot: {column}')
+
+    @app.cli.command('seed')
+    def seed_command():
+        """Tạo dữ liệu mẫu (chỉ khi database chưa có user nào)"""
+        from services.schema import init_database
+
+        _, seeded = init_database(seed=True)
+        click.echo('Da tao du lieu mau thanh cong!' if seeded else 'Database da co du lieu, bo qua.')
+
+    @app.cli.command('rebuild-rollup')
+    def rebuild_rollup_command():
+        """Tính lại bảng tổng hợp doanh thu theo ngày từ lịch sử đơn hàng"""
+        from services.rollup import rebuild_rollup
+
+        days = rebuild_rollup()
+        click.echo(f'Da tong hop {days} ngay doanh thu.')
+
+    @app.cli.command('backfill-item-costs')
+    def backfill_item_costs_command():
+        """Chốt giá vốn nguyên liệu cho các OrderItem cũ (chạy 1 lần sau khi nâng cấp)"""
+        from services.costing import backfill_item_costs
+
+        updated = backfill_item_costs()
+        click.echo(f'Da cap nhat gia von cho {updated} mon trong don hang.')
+        click.echo('Chay "flask rebuild-rollup" de cap nhat lai bang tong hop.')
+
+    @app.cli.command('backfill-menu-images')
+    @click.option('--workers', type=int, default=None, help='So process xu ly anh (mac dinh: so CPU)')
+    @click.option('--force', is_flag=True, help='Tao lai ca cac mon da co ban anh')
+    def backfill_menu_images_command(workers, force):
+        """Tạo bản ảnh thumb/card/full (WebP, JPEG) cho ảnh món ăn đã upload trước đây"""
+        from services.images import backfill_menu_variants
+
+        updated, missing = backfill_menu_variants(workers=workers, force=force)
+        click.echo(f'Da tao ban anh cho {updated} mon.')
+        for filename in missing:
+            click.echo(f'Khong tim thay anh: {filename}')
+
+    @app.cli.command('hash-menu-images')
+    def hash_menu_images_command():
+        """Đổi ảnh món ăn tên cũ sang tên theo hash nội dung (URL cache lâu dài, gộp ảnh trùng)"""
+        from services.images import hash_menu_images
+
+        updated = hash_menu_images()
+        click.echo(f'Da chuyen anh cua {updated} mon sang ten theo hash.')
+        if updated:
+            click.echo('Chay "flask backfill-menu-images" de tao lai ban anh cho cac mon nay.')
+
+    @app.cli.command('gc-uploads')
+    @click.option('--dry-run', is_flag=True, help='Chi liet ke, khong xoa')
+    @click.option('--grace-hours', type=float, default=None, help='Giu file moi hon so gio nay (mac dinh: UPLOAD_GC_GRACE_HOURS)')
+    @click.option('--workers', type=int, default=8, help='So thread quet thu muc')
+    def gc_uploads_command(dry_run, grace_hours, workers):
+        """Xóa ảnh món ăn và ảnh kiểm tra nguyên liệu không còn được tham chiếu trong DB"""
+        from services.upload_gc import collect_garbage
+
+        if grace_hours is None:
+            grace_hours = app.config['UPLOAD_GC_GRACE_HOURS']
+        orphans = collect_garbage(grace_hours * 3600, dry_run=dry_run, workers=workers)
+        for orphan in orphans:
+            click.echo(orphan.path)
+        action = 'Se xoa' if dry_run else 'Da xoa'
+        click.echo(f'{action} {len(orphans)} file ({sum(o.size for o in orphans) / 1024 / 1024:.1f} MB).')
+
+    @app.cli.command('run-jobs')
+    def run_jobs_command():
+        """Chạy worker job kiểm tra AI ở process riêng (đặt JOB_WORKER_ENABLED=false cho web)"""
+        import time
+        from services.jobs import JobWorker
+
+        worker = JobWorker(app)
+        worker.start()
+        click.echo(f'Dang chay worker ({worker.concurrency} job song song), Ctrl+C de dung.')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            click.echo('Dang cho cac job dang chay hoan thanh...')
+            worker.stop()
@@ -11,18 +11,118 @@ os.makedirs(DATABASE_DIR, exist_ok=True)
 
 DATABASE_PATH = os.path.join(DATABASE_DIR, "restaurant.db")
 
+
+def _database_uri():
+    """Lấy URI database từ DATABASE_URL (mặc định: SQLite trong thư mục database/)"""
+    uri = os.environ.get("DATABASE_URL") or "sqlite:///" + DATABASE_PATH
+
+    # Chuẩn hóa postgres:// và postgresql:// về driver psycopg (v3) trong requirements.txt
+    for prefix in ("postgres://", "postgresql://"):
+        if uri.startswith(prefix):
+            uri = "postgresql+psycopg://" + uri[len(prefix):]
+
+    # Đường dẫn SQLite tương đối được tính từ thư mục dự án
+    if uri.startswith("sqlite:///"):
+        path = uri[len("sqlite:///"):]
+        if path and path != ":memory:" and not os.path.isabs(path):
+            uri = "sqlite:///" + os.path.join(BASE_DIR, path)
+
+    return uri
+
+
+def _engine_options(uri):
+    """Tùy chọn engine/pool, cấu hình qua biến môi trường DB_*"""
+    options = {
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true",
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    }
+
+    # SQLite không cần pool nhiều kết nối
+    if not uri.startswith("sqlite"):
+        options.update({
+            "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+            "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+            "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        })
+
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
 
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + DATABASE_PATH
+    SQLALCHEMY_DATABASE_URI = _database_uri()
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Tinh chỉnh SQLite (chỉ áp dụng khi dùng SQLite), đặt cho mỗi kết nối mới
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")  # WAL: đọc không bị chặn khi đang ghi
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 32768))
+    SQLITE_TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "MEMORY")
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+    # Tạo bảng và dữ liệu mẫu mỗi lần khởi động (mặc định tắt: chạy `flask init-db` và `flask seed` khi triển khai)
+    AUTO_INIT_DB = os.environ.get("AUTO_INIT_DB", "false").lower() == "true"
+
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "static", "images", "menu")
+    INSPECTION_UPLOAD_FOLDER = os.path.join(BASE_DIR, "static", "uploads", "inventory")
+    # `flask gc-uploads`: chỉ xóa file không được tham chiếu và cũ hơn số giờ này (tránh file đang upload dở)
+    UPLOAD_GC_GRACE_HOURS = float(os.environ.get("UPLOAD_GC_GRACE_HOURS", 24))
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp"}
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
 
+    # Cache người dùng đăng nhập trong process: thời gian sống và số user tối đa
+    USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", 60))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 10000))
+
+    # Phiên bản cache (menu, đặt bàn, user): sqlite/file = dùng chung giữa các worker trên cùng máy;
+    # local chỉ đúng khi chạy 1 process (worker khác không thấy thay đổi)
+    CACHE_VERSION_BACKEND = os.environ.get("CACHE_VERSION_BACKEND", "sqlite")
+    CACHE_VERSION_PATH = os.path.join(BASE_DIR, os.environ.get("CACHE_VERSION_PATH", os.path.join("instance", "cache")))
+
+    # Phân trang danh sách (keyset): số dòng mặc định và tối đa mỗi trang
+    PAGE_SIZE = int(os.environ.get("PAGE_SIZE", 25))
+    MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 100))
+
+    # Đặt bàn: giờ mở cửa và bước slot cho lưới bàn trống
+    RESERVATION_OPENING_TIME = os.environ.get("RESERVATION_OPENING_TIME", "10:00")
+    RESERVATION_CLOSING_TIME = os.environ.get("RESERVATION_CLOSING_TIME", "22:00")
+    RESERVATION_SLOT_MINUTES = int(os.environ.get("RESERVATION_SLOT_MINUTES", 15))
+
+    # Server-Sent Events: nhịp ping giữ kết nối và thời gian tối đa của 1 luồng
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+    SSE_MAX_STREAM_SECONDS = int(os.environ.get("SSE_MAX_STREAM_SECONDS", 300))
+
+    # API phiếu bếp ?since=: đọc lại các đơn thay đổi trong số giây này trước cursor
+    # (đơn flush trước nhưng commit muộn hơn có tem nhỏ hơn cursor đã trả)
+    KITCHEN_SYNC_WINDOW_SECONDS = float(os.environ.get("KITCHEN_SYNC_WINDOW_SECONDS", 10))
+
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-    PUBLIC_BASE_URL = "https://ammie-sniffish-immoderately.ngrok-free.dev"
+    # Model AI: endpoint (để trống = OpenAI, hoặc scripts/fake_model_server.py khi test), timeout, pool kết nối dùng chung
+    OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+    OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", 30))
+    OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_CONNECT_TIMEOUT_SECONDS", 5))
+    OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", 10))
 
+    # Chatbot: cache câu trả lời của model theo câu hỏi (local = trong process, sqlite = dùng chung giữa các worker)
+    CHATBOT_CACHE_BACKEND = os.environ.get("CHATBOT_CACHE_BACKEND", "local")
+    CHATBOT_CACHE_TTL_SECONDS = int(os.environ.get("CHATBOT_CACHE_TTL_SECONDS", 3600))
+    CHATBOT_CACHE_MAX_ENTRIES = int(os.environ.get("CHATBOT_CACHE_MAX_ENTRIES", 1000))
+    # Chatbot gọi model: thời gian chờ tối đa giữa 2 đoạn trả lời và tổng thời gian 1 luồng stream
+    CHATBOT_TIMEOUT_SECONDS = float(os.environ.get("CHATBOT_TIMEOUT_SECONDS", 15))
+    CHATBOT_STREAM_MAX_SECONDS = float(os.environ.get("CHATBOT_STREAM_MAX_SECONDS", 60))
+
+    # Job nền kiểm tra AI: worker chạy trong process web (false nếu chạy riêng `flask run-jobs`),
+    # số job song song, số lần thử, backoff (nhân đôi sau mỗi lần lỗi) và thời gian giữ job đang chạy
+    JOB_WORKER_ENABLED = os.environ.get("JOB_WORKER_ENABLED", "true").lower() == "true"
+    JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", 4))
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETRY_BACKOFF_SECONDS = float(os.environ.get("JOB_RETRY_BACKOFF_SECONDS", 5))
+    JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", 2))
+    JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 300))
+    PUBLIC_BASE_URL = "https://ammie-sniffish-immoderately.ngrok-free.dev"
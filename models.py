@@ -88,6 +88,11 @@ class Table(db.Model):
 class Reservation(db.Model):
     """Model Reservation - Quản lý đặt bàn"""
     __tablename__ = 'reservations'
+    __table_args__ = (
+        db.Index('ix_reservations_table_status_time', 'table_id', 'status', 'reservation_time'),
+        db.Index('ix_reservations_customer_time', 'customer_id', 'reservation_time'),
+        db.Index('ix_reservations_time', 'reservation_time'),
+    )
 
     reservation_id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -116,6 +121,8 @@ class Menu(db.Model):
     price = db.Column(db.Float, nullable=False)
     category = db.Column(db.String(50), nullable=False)  # appetizer, main, dessert, drink
     image_url = db.Column(db.String(255))
+    # Các bản ảnh đã tạo: {thumb|card|full: {width, height, webp, jpeg}} (đường dẫn trong thư mục ảnh menu)
+    image_variants = db.Column(db.JSON)
     available = db.Column(db.Boolean, default=True)
     preparation_time = db.Column(db.Integer, default=15)  # minutes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -132,6 +139,13 @@ class Menu(db.Model):
 class Order(db.Model):
     """Model Order - Quản lý đơn hàng"""
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_status_completed_time', 'status', 'completed_time'),
+        db.Index('ix_orders_customer_order_time', 'customer_id', 'order_time'),
+        db.Index('ix_orders_order_time', 'order_time'),
+        db.Index('ix_orders_shipper_status', 'shipper_id', 'status'),
+        db.Index('ix_orders_updated_at', 'updated_at'),
+    )
 
     order_id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -144,6 +158,10 @@ class Order(db.Model):
     delivery_address = db.Column(db.String(255))
     notes = db.Column(db.Text)
 
+    # Phiên bản đơn hàng: tăng khi đơn, món, thanh toán hoặc shipper thay đổi (dùng cho ETag)
+    version = db.Column(db.Integer, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
     # Shipper giao hàng (cho đơn delivery)
     shipper_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=True)
     shipper = db.relationship('User', foreign_keys=[shipper_id], backref='delivery_orders')
@@ -166,6 +184,11 @@ class Order(db.Model):
 class OrderItem(db.Model):
     """Model OrderItem - Chi tiết món trong đơn hàng"""
     __tablename__ = 'order_items'
+    __table_args__ = (
+        db.Index('ix_order_items_order_status', 'order_id', 'status'),
+        db.Index('ix_order_items_status', 'status'),
+        db.Index('ix_order_items_menu', 'menu_id'),
+    )
 
     order_item_id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False)
@@ -175,6 +198,10 @@ class OrderItem(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, preparing, completed
     notes = db.Column(db.String(255))
 
+    # Giá vốn nguyên liệu chốt tại thời điểm bán (không đổi khi giá nhập thay đổi)
+    unit_cost_snapshot = db.Column(db.Float)  # Giá vốn cho 1 phần
+    line_cost = db.Column(db.Float)  # unit_cost_snapshot * quantity
+
     # Đầu bếp nấu món này
     chef_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=True)
     chef = db.relationship('User', foreign_keys=[chef_id], backref='cooked_items')
@@ -186,6 +213,10 @@ class OrderItem(db.Model):
 class Payment(db.Model):
     """Model Payment - Quản lý thanh toán"""
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_status_time', 'payment_status', 'payment_time'),
+        db.Index('ix_payments_order', 'order_id'),
+    )
     
     payment_id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False)
@@ -296,6 +327,9 @@ class Promotion(db.Model):
 class MenuIngredient(db.Model):
     """Model MenuIngredient - Liên kết món ăn với nguyên liệu"""
     __tablename__ = 'menu_ingredients'
+    __table_args__ = (
+        db.Index('ix_menu_ingredients_menu', 'menu_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     menu_id = db.Column(db.Integer, db.ForeignKey('menu.menu_id'), nullable=False)
@@ -334,3 +368,86 @@ class InventoryInspection(db.Model):
         db.DateTime,
         default=datetime.utcnow
     )
+
+
+class InspectionBatch(db.Model):
+    """Model InspectionBatch - Lượt kiểm tra AI nhiều nguyên liệu; kết quả được ghi trong 1 transaction khi mọi job xong"""
+    __tablename__ = 'inspection_batches'
+
+    batch_id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, completed
+    total_jobs = db.Column(db.Integer, nullable=False, default=0)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.user_id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    jobs = db.relationship('InspectionJob', backref='batch', lazy=True, order_by='InspectionJob.job_id')
+
+    def __repr__(self):
+        return f'<InspectionBatch {self.batch_id} {self.status}>'
+
+
+class InspectionJob(db.Model):
+    """Model InspectionJob - Job nền kiểm tra VSATTP nguyên liệu bằng AI"""
+    __tablename__ = 'inspection_jobs'
+    __table_args__ = (
+        # Worker tìm job đến hạn theo (status, run_at)
+        db.Index('ix_inspection_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    job_id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.String(32), db.ForeignKey('inspection_batches.batch_id'), index=True)  # Chỉ có khi kiểm tra hàng loạt
+    inventory_id = db.Column(db.Integer, db.ForeignKey('inventory.item_id'), nullable=False)
+    image_url = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Chạy sớm nhất lúc (backoff khi thử lại)
+    result = db.Column(db.Text)  # JSON kết quả từ model
+    error = db.Column(db.Text)
+    inspection_id = db.Column(db.Integer, db.ForeignKey('inventory_inspection.id'))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.user_id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    inventory = db.relationship('Inventory')
+    inspection = db.relationship('InventoryInspection')
+
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def __repr__(self):
+        return f'<InspectionJob {self.job_id} {self.status}>'
+
+
+class DailySalesRollup(db.Model):
+    """Model DailySalesRollup - Số liệu doanh thu/chi phí tổng hợp theo ngày"""
+    __tablename__ = 'daily_sales_rollup'
+
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0)  # Theo ngày thanh toán
+    ingredient_cost = db.Column(db.Float, nullable=False, default=0)  # Theo ngày hoàn thành đơn
+    completed_orders = db.Column(db.Integer, nullable=False, default=0)
+    dine_in_orders = db.Column(db.Integer, nullable=False, default=0)
+    takeaway_orders = db.Column(db.Integer, nullable=False, default=0)
+    delivery_orders = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailySalesRollup {self.day}>'
+
+
+class DailyMenuSales(db.Model):
+    """Model DailyMenuSales - Số phần đã bán của từng món theo ngày"""
+    __tablename__ = 'daily_menu_sales'
+
+    day = db.Column(db.Date, primary_key=True)
+    menu_id = db.Column(db.Integer, db.ForeignKey('menu.menu_id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    menu = db.relationship('Menu')
+
+    def __repr__(self):
+        return f'<DailyMenuSales {self.day}-{self.menu_id}>'
@@ -1,13 +1,21 @@
 
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
-from models import db, User, Menu, Table, Order, OrderItem, Payment, Inventory, Feedback, Promotion, Reservation, InventoryInspection, MenuIngredient
+from models import db, User, Menu, Table, Order, OrderItem, Inventory, Feedback, Promotion, Reservation, MenuIngredient, InspectionBatch, InspectionJob
 from datetime import datetime, timedelta
 from sqlalchemy import func
-from werkzeug.utils import secure_filename
-from openai import OpenAI
-import os, json, base64
 from config import Config
+from services.rollup import sales_totals, daily_rollups, top_menu_items
+from services.timerange import date_range
+from services.events import publish_order_event, DELIVERY_TOPIC
+from services.menu_catalog import invalidate_catalog
+from services.reports import daily_revenue_query, top_dishes_query, order_types_query, top_customers_query
+from services.export import export_response
+from services.pagination import keyset_paginate, wants_json, page_json
+from services.jobs import enqueue_inspections, job_status, batch_status
+from services.images import build_menu_variants, release_menu_image
+from services.assets import save_upload
+from services.user_cache import invalidate_users
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -43,75 +51,33 @@ def dashboard():
     # Thống kê đơn hàng
     total_orders = Order.query.count()
     pending_orders = Order.query.filter_by(status='pending').count()
-    completed_orders = Order.query.filter_by(status='completed').count()
-    
-    # Doanh thu
-    total_revenue = db.session.query(func.sum(Payment.final_amount)).filter(
-        Payment.payment_status == 'completed'
-    ).scalar() or 0
-
-    # Doanh thu hôm nay
-    today_revenue = db.session.query(func.sum(Payment.final_amount)).filter(
-        Payment.payment_status == 'completed',
-        func.date(Payment.payment_time) == datetime.utcnow().date()
-    ).scalar() or 0
-
-    # Doanh thu tháng này
-    month_revenue = db.session.query(func.sum(Payment.final_amount)).filter(
-        Payment.payment_status == 'completed',
-        func.extract('year', Payment.payment_time) == datetime.utcnow().year,
-        func.extract('month', Payment.payment_time) == datetime.utcnow().month
-    ).scalar() or 0
-
-    total_ingredient_cost = db.session.query(
-        func.sum(MenuIngredient.quantity_needed * Inventory.unit_cost * OrderItem.quantity)
-    ).join(Menu, MenuIngredient.menu_id == Menu.menu_id
-    ).join(Inventory, MenuIngredient.inventory_id == Inventory.item_id
-    ).join(OrderItem, OrderItem.menu_id == Menu.menu_id
-    ).join(Order, OrderItem.order_id == Order.order_id
-    ).filter(Order.status == 'completed').scalar() or 0
 
+    # Doanh thu, chi phí: đọc từ bảng tổng hợp theo ngày
+    total_revenue, total_ingredient_cost, completed_orders = sales_totals()
     total_profit = total_revenue - total_ingredient_cost
 
-    # Chi phí hôm nay
-    today_ingredient_cost = db.session.query(
-        func.sum(MenuIngredient.quantity_needed * Inventory.unit_cost * OrderItem.quantity)
-    ).join(Menu, MenuIngredient.menu_id == Menu.menu_id
-    ).join(Inventory, MenuIngredient.inventory_id == Inventory.item_id
-    ).join(OrderItem, OrderItem.menu_id == Menu.menu_id
-    ).join(Order, OrderItem.order_id == Order.order_id
-    ).filter(
-        Order.status == 'completed',
-        func.date(Order.completed_time) == datetime.utcnow().date()
-    ).scalar() or 0
+    today = datetime.utcnow().date()
+    month_start = today.replace(day=1)
+    chart_start = today - timedelta(days=6)
+    rollups = daily_rollups(min(month_start, chart_start), today)
 
+    # Doanh thu / chi phí hôm nay
+    today_rollup = rollups.get(today)
+    today_revenue = today_rollup.revenue if today_rollup else 0
+    today_ingredient_cost = today_rollup.ingredient_cost if today_rollup else 0
     today_profit = today_revenue - today_ingredient_cost
 
-    # Chi phí tháng này
-    month_ingredient_cost = db.session.query(
-        func.sum(MenuIngredient.quantity_needed * Inventory.unit_cost * OrderItem.quantity)
-    ).join(Menu, MenuIngredient.menu_id == Menu.menu_id
-    ).join(Inventory, MenuIngredient.inventory_id == Inventory.item_id
-    ).join(OrderItem, OrderItem.menu_id == Menu.menu_id
-    ).join(Order, OrderItem.order_id == Order.order_id
-    ).filter(
-        Order.status == 'completed',
-        func.extract('year', Order.completed_time) == datetime.utcnow().year,
-        func.extract('month', Order.completed_time) == datetime.utcnow().month
-    ).scalar() or 0
-
+    # Doanh thu / chi phí tháng này
+    month_rollups = [r for day, r in rollups.items() if day >= month_start]
+    month_revenue = sum(r.revenue for r in month_rollups)
+    month_ingredient_cost = sum(r.ingredient_cost for r in month_rollups)
     month_profit = month_revenue - month_ingredient_cost
 
     # Tỷ lệ lợi nhuận (%)
     profit_margin = (total_profit / total_revenue * 100) if total_revenue > 0 else 0
     
     # Món bán chạy
-    top_dishes = db.session.query(
-        Menu.name,
-        func.sum(OrderItem.quantity).label('total_sold')
-    ).join(OrderItem).join(Order).filter(
-        Order.status == 'completed'
-    ).group_by(Menu.menu_id).order_by(func.sum(OrderItem.quantity).desc()).limit(5).all()
+    top_dishes = top_menu_items(limit=5)
     
     # Đánh giá trung bình
     avg_rating = db.session.query(func.avg(Feedback.rating)).scalar() or 0
@@ -123,14 +89,11 @@ def dashboard():
     
     revenue_chart = []
     for i in range(6, -1, -1):
-        date = datetime.utcnow().date() - timedelta(days=i)
-        revenue = db.session.query(func.sum(Payment.final_amount)).filter(
-            Payment.payment_status == 'completed',
-            func.date(Payment.payment_time) == date
-        ).scalar() or 0
+        date = today - timedelta(days=i)
+        rollup = rollups.get(date)
         revenue_chart.append({
             'date': date.strftime('%d/%m'),
-            'revenue': float(revenue)
+            'revenue': float(rollup.revenue) if rollup else 0.0
         })
     
     # Đơn hàng gần đây
@@ -170,10 +133,16 @@ def users():
     if role_filter != 'all':
         query = query.filter_by(role=role_filter)
     
-    users = query.order_by(User.created_at.desc()).all()
+    page = keyset_paginate(query, User.created_at, User.user_id, nullable=True)
+    if wants_json():
+        return page_json(page, exclude=('password_hash',))
+
+    user_count = query.count()
     
     return render_template('admin/users.html',
-                         users=users,
+                         users=page.items,
+                         page=page,
+                         user_count=user_count,
                          role_filter=role_filter)
 
 
@@ -243,6 +212,7 @@ def edit_user(user_id):
             user.set_password(new_password)
         
         db.session.commit()
+        invalidate_users()
         
         flash('Đã cập nhật thông tin người dùng.', 'success')
         return redirect(url_for('admin.users'))
@@ -264,6 +234,7 @@ def delete_user(user_id):
     
     db.session.delete(user)
     db.session.commit()
+    invalidate_users()
     
     flash('Đã xóa người dùng.', 'success')
     return redirect(url_for('admin.users'))
@@ -282,6 +253,7 @@ def toggle_user_status(user_id):
     
     user.active = not user.active  # Đảo ngược trạng thái
     db.session.commit()
+    invalidate_users()
     
     flash(f"Đã {'kích hoạt' if user.active else 'vô hiệu hóa'} tài khoản của {user.name}.", 'success')
     return redirect(url_for('admin.users'))
@@ -323,18 +295,14 @@ def add_menu_item():
         
         # Upload hình ảnh
         image_url = 'default.jpg'
+        image_variants = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Tạo tên file unique
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                
-                from flask import current_app
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
+                # Tên file theo hash nội dung: ảnh trùng chỉ lưu 1 lần
+                filename = save_upload(file, current_app.config['UPLOAD_FOLDER'])
                 image_url = filename
+                image_variants = build_menu_variants(filename)
         
         new_item = Menu(
             name=name,
@@ -342,12 +310,14 @@ def add_menu_item():
             price=float(price),
             category=category,
             image_url=image_url,
+            image_variants=image_variants,
             available=available,
             preparation_time=int(preparation_time)
         )
         
         db.session.add(new_item)
         db.session.commit()
+        invalidate_catalog()
         
         flash('Đã thêm món ăn mới.', 'success')
         return redirect(url_for('admin.menu'))
@@ -372,30 +342,26 @@ def edit_menu_item(menu_id):
 
         # Handle image upload (ONLY if user selects new image)
         file = request.files.get('image')
+        old_image = None
 
         if file and file.filename and allowed_file(file.filename):
-            from flask import current_app
-
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-
-            # 1️⃣ Delete old image (if exists)
-            if menu_item.image_url:
-                old_path = os.path.join(upload_folder, menu_item.image_url)
-                if os.path.exists(old_path):
-                    os.remove(old_path)
+            # 1️⃣ Save new image (tên theo hash nội dung)
+            new_filename = save_upload(file, current_app.config['UPLOAD_FOLDER'])
 
-            # 2️⃣ Save new image
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            new_filename = f"{timestamp}_{filename}"
+            if new_filename != menu_item.image_url:
+                old_image = (menu_item.image_url, menu_item.image_variants)
 
-            new_path = os.path.join(upload_folder, new_filename)
-            file.save(new_path)
-
-            # 3️⃣ Update DB
-            menu_item.image_url = new_filename
+                # 2️⃣ Update DB (tạo bản ảnh trước khi gán để truy vấn ảnh dùng chung không thấy chính món này)
+                image_variants = build_menu_variants(new_filename)
+                menu_item.image_url = new_filename
+                menu_item.image_variants = image_variants
 
         db.session.commit()
+        invalidate_catalog()
+
+        # 3️⃣ Delete old image sau khi commit thành công (nếu không còn món nào dùng chung)
+        if old_image:
+            release_menu_image(*old_image)
         flash('Đã cập nhật món ăn.', 'success')
         return redirect(url_for('admin.menu'))
 
@@ -409,9 +375,14 @@ def edit_menu_item(menu_id):
 def delete_menu_item(menu_id):
     """Xóa món ăn"""
     menu_item = Menu.query.get_or_404(menu_id)
+    image = (menu_item.image_url, menu_item.image_variants)
     
     db.session.delete(menu_item)
     db.session.commit()
+    invalidate_catalog()
+
+    # Xóa ảnh sau khi commit thành công: commit lỗi thì món vẫn còn nguyên ảnh
+    release_menu_image(*image)
     
     flash('Đã xóa món ăn.', 'success')
     return redirect(url_for('admin.menu'))
@@ -423,6 +394,7 @@ def toggle_menu_availability(menu_id):
     menu_item = Menu.query.get_or_404(menu_id)
     menu_item.available = not menu_item.available  # Đảo trạng thái
     db.session.commit()
+    invalidate_catalog()
     flash(f"Đã {'mở' if menu_item.available else 'đóng'} món '{menu_item.name}'.", "info")
     return redirect(url_for('admin.menu'))
 
@@ -512,7 +484,10 @@ def orders():
     status_filter = request.args.get('status', 'all')
     type_filter = request.args.get('type', 'all')
     
-    query = Order.query
+    query = Order.query.options(
+        db.joinedload(Order.customer),
+        db.selectinload(Order.order_items).joinedload(OrderItem.menu_item)
+    )
     
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
@@ -520,10 +495,13 @@ def orders():
     if type_filter != 'all':
         query = query.filter_by(order_type=type_filter)
     
-    orders = query.order_by(Order.order_time.desc()).all()
+    page = keyset_paginate(query, Order.order_time, Order.order_id)
+    if wants_json():
+        return page_json(page)
     
     return render_template('admin/orders.html',
-                         orders=orders,
+                         orders=page.items,
+                         page=page,
                          status_filter=status_filter,
                          type_filter=type_filter)
 
@@ -617,109 +595,135 @@ def delete_inventory_item(item_id):
     flash('Đã xóa nguyên liệu.', 'success')
     return redirect(url_for('admin.inventory'))
 
+def _save_inspection_image(file):
+    """Lưu ảnh kiểm tra vào static/uploads/inventory (tên theo hash nội dung), trả về URL tương đối"""
+    filename = save_upload(file, current_app.config["INSPECTION_UPLOAD_FOLDER"])
+    return f"/static/uploads/inventory/{filename}"
+
+
+def _wants_json_response():
+    return request.accept_mimetypes.best == "application/json"
+
+
+def _job_accepted(jobs):
+    """202 kèm job id và URL polling trạng thái"""
+    batch_id = jobs[0].batch_id
+    response = jsonify({
+        "batch_id": batch_id,
+        "batch_url": url_for("admin.inspection_batch", batch_id=batch_id) if batch_id else None,
+        "jobs": [
+            {
+                "job_id": job.job_id,
+                "inventory_id": job.inventory_id,
+                "status_url": url_for("admin.inspection_job_status", job_id=job.job_id),
+            }
+            for job in jobs
+        ],
+    })
+    response.status_code = 202
+    if batch_id:
+        response.headers["Location"] = url_for("admin.inspection_batch", batch_id=batch_id)
+    else:
+        response.headers["Location"] = url_for("admin.inspection_job_status", job_id=jobs[0].job_id)
+    return response
+
+
 @bp.route("/inventory/<int:item_id>/inspect", methods=["POST"])
 @login_required
 @admin_required
 def inspect_inventory(item_id):
+    """Đưa ảnh nguyên liệu vào hàng đợi kiểm tra VSATTP bằng AI (không chờ model trả lời)"""
     item = Inventory.query.get_or_404(item_id)
 
     file = request.files.get("image")
     if not file:
+        if _wants_json_response():
+            return jsonify({"error": "Vui lòng tải lên hình ảnh nguyên liệu"}), 400
         flash("Vui lòng tải lên hình ảnh nguyên liệu", "danger")
         return redirect(url_for("admin.inventory"))
 
-    filename = secure_filename(file.filename)
+    image_url = _save_inspection_image(file)
+    jobs = enqueue_inspections([(item.item_id, image_url)], user_id=current_user.user_id)
 
-    upload_folder = os.path.join(
-        current_app.root_path,
-        "static/uploads/inventory"
-    )
-    os.makedirs(upload_folder, exist_ok=True)
+    if _wants_json_response():
+        return _job_accepted(jobs)
 
-    image_path = os.path.join(upload_folder, filename)
-    file.save(image_path)
+    flash("🤖 Đã gửi ảnh cho AI phân tích VSATTP, kết quả sẽ cập nhật sau ít giây", "info")
+    return redirect(url_for("admin.inventory"))
 
-    image_url = f"/static/uploads/inventory/{filename}"
 
-    public_base = current_app.config["PUBLIC_BASE_URL"]
-    public_image_url = public_base + image_url
+@bp.route("/inspection-jobs", methods=["POST"])
+@login_required
+@admin_required
+def submit_inspection_jobs():
+    """Gửi nhiều ảnh kiểm tra cùng lúc: các trường item_id và image theo cùng thứ tự"""
+    item_ids = request.form.getlist("item_id", type=int)
+    files = request.files.getlist("image")
+    if not files or len(item_ids) != len(files):
+        return jsonify({"error": "Mỗi ảnh cần đúng 1 item_id"}), 400
 
-    client = OpenAI(api_key=current_app.config["OPENAI_API_KEY"])
+    found = {item_id for (item_id,) in db.session.query(Inventory.item_id).filter(Inventory.item_id.in_(item_ids))}
+    missing = sorted(set(item_ids) - found)
+    if missing:
+        return jsonify({"error": f"Không tìm thấy nguyên liệu: {missing}"}), 404
 
-    prompt = """
-        Bạn là hệ thống AI kiểm tra an toàn vệ sinh thực phẩm.
+    entries = [(item_id, _save_inspection_image(file)) for item_id, file in zip(item_ids, files)]
+    return _job_accepted(enqueue_inspections(entries, user_id=current_user.user_id, batch=True))
 
-        NHIỆM VỤ:
-        Phân tích hình ảnh nguyên liệu thực phẩm.
 
-        QUY TẮC BẮT BUỘC:
-        - CHỈ trả về JSON thuần
-        - KHÔNG markdown
-        - KHÔNG ```json
-        - KHÔNG giải thích
-        - KHÔNG thêm text bên ngoài
+@bp.route("/inspection-jobs/<int:job_id>")
+@login_required
+@admin_required
+def inspection_job_status(job_id):
+    """Trạng thái job kiểm tra AI (polling)"""
+    job = InspectionJob.query.get_or_404(job_id)
+    response = jsonify(job_status(job))
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
-        FORMAT CHÍNH XÁC (bắt buộc):
-        {
-        "status": "safe" | "warning" | "unsafe",
-        "issues": ["mô tả ngắn gọn"],
-        "confidence": 0.0,
-        "recommendation": "khuyến nghị"
-        }
 
-        Nếu không chắc chắn → status = "warning"
-        """
+@bp.route("/inventory/inspect-batch", methods=["GET", "POST"])
+@login_required
+@admin_required
+def inspect_inventory_batch():
+    """Kiểm tra AI hàng loạt: mỗi nguyên liệu 1 ảnh (trường image_<item_id>), chạy song song trong nền"""
+    inventory = Inventory.query.order_by(Inventory.name).all()
 
+    if request.method == "POST":
+        entries = []
+        for item in inventory:
+            file = request.files.get(f"image_{item.item_id}")
+            if file and file.filename:
+                entries.append((item.item_id, _save_inspection_image(file)))
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": public_image_url
-                        }
-                    }
-                ]
-            }
-        ],
-        temperature=0.2,
-        max_tokens=300
-    )
+        if not entries:
+            flash("Vui lòng chọn ảnh cho ít nhất 1 nguyên liệu", "danger")
+            return redirect(url_for("admin.inspect_inventory_batch"))
 
-    ai_result = response.choices[0].message.content
+        jobs = enqueue_inspections(entries, user_id=current_user.user_id, batch=True)
+        if _wants_json_response():
+            return _job_accepted(jobs)
+        return redirect(url_for("admin.inspection_batch", batch_id=jobs[0].batch_id))
 
-    # -----------------------------
-    # 3. PARSE JSON
-    # -----------------------------
-    try:
-        data = json.loads(ai_result)
-    except Exception:
-        flash("AI phân tích thất bại (JSON không hợp lệ)", "danger")
-        return redirect(url_for("admin.inventory"))
+    return render_template("admin/inspect_batch.html", inventory=inventory)
 
-    inspection = InventoryInspection(
-        inventory_id=item.item_id,
-        image_url=image_url,
-        ai_status=data.get("status"),
-        ai_issues=", ".join(data.get("issues", [])),
-        ai_confidence=data.get("confidence"),
-        ai_recommendation=data.get("recommendation"),
-        inspected_at=datetime.utcnow()
-    )
-    # 🔥 CẬP NHẬT TRẠNG THÁI AI VÀO INVENTORY
-    item.ai_status = data.get("status")
-    item.ai_checked_at = datetime.utcnow()
 
-    db.session.add(inspection)
-    db.session.commit()
+@bp.route("/inspection-batches/<batch_id>")
+@login_required
+@admin_required
+def inspection_batch(batch_id):
+    """Tiến độ và tổng hợp kết quả 1 lượt kiểm tra hàng loạt (?format=json cho polling)"""
+    batch = InspectionBatch.query.options(
+        db.selectinload(InspectionBatch.jobs).joinedload(InspectionJob.inventory)
+    ).get_or_404(batch_id)
+    status = batch_status(batch)
 
-    flash("🤖 Đã phân tích VSATTP bằng AI", "success")
-    return redirect(url_for("admin.inventory"))
+    if wants_json():
+        response = jsonify(status)
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    return render_template("admin/inspection_batch.html", batch=status)
 
 
 
@@ -825,10 +829,13 @@ def delete_promotion(promo_id):
 @admin_required
 def feedback():
     """Xem feedback từ khách hàng"""
-    feedbacks = Feedback.query.order_by(Feedback.created_at.desc()).all()
+    page = keyset_paginate(Feedback.query, Feedback.created_at, Feedback.feedback_id, nullable=True)
+    if wants_json():
+        return page_json(page)
     
     return render_template('admin/feedback.html',
-                         feedbacks=feedbacks)
+                         feedbacks=page.items,
+                         page=page)
 
 
 @bp.route('/feedback/<int:feedback_id>/respond', methods=['POST'])
@@ -847,16 +854,11 @@ def respond_feedback(feedback_id):
 
 
 # ===== BÁO CÁO & THỐNG KÊ =====
-@bp.route('/reports')
-@login_required
-@admin_required
-def reports():
-    """Báo cáo & thống kê"""
-    # Lấy tham số thời gian
+def report_dates():
+    """Khoảng ngày từ tham số start_date/end_date (mặc định: 30 ngày gần đây)"""
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
     
-    # Mặc định: 30 ngày gần đây
     if not start_date_str:
         start_date = datetime.utcnow().date() - timedelta(days=30)
     else:
@@ -866,46 +868,22 @@ def reports():
         end_date = datetime.utcnow().date()
     else:
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-    
-    # Doanh thu theo ngày
-    daily_revenue = db.session.query(
-        func.date(Payment.payment_time).label('date'),
-        func.sum(Payment.final_amount).label('revenue')
-    ).filter(
-        Payment.payment_status == 'completed',
-        func.date(Payment.payment_time).between(start_date, end_date)
-    ).group_by(func.date(Payment.payment_time)).order_by('date').all()
-    
-    # Món bán chạy
-    top_dishes = db.session.query(
-        Menu.name,
-        func.sum(OrderItem.quantity).label('total_sold'),
-        func.sum(OrderItem.quantity * OrderItem.price).label('revenue')
-    ).join(OrderItem).join(Order).filter(
-        Order.status == 'completed',
-        func.date(Order.completed_time).between(start_date, end_date)
-    ).group_by(Menu.menu_id).order_by(func.sum(OrderItem.quantity).desc()).limit(10).all()
-    
-    # Thống kê theo loại đơn
-    order_types = db.session.query(
-        Order.order_type,
-        func.count(Order.order_id).label('count'),
-        func.sum(Order.total_amount).label('revenue')
-    ).filter(
-        Order.status == 'completed',
-        func.date(Order.completed_time).between(start_date, end_date)
-    ).group_by(Order.order_type).all()
-    
-    # Khách hàng top
-    top_customers = db.session.query(
-        User.name,
-        User.email,
-        func.count(Order.order_id).label('order_count'),
-        func.sum(Order.total_amount).label('total_spent')
-    ).join(Order, User.user_id == Order.customer_id).filter(
-        Order.status == 'completed',
-        func.date(Order.completed_time).between(start_date, end_date)
-    ).group_by(User.user_id).order_by(func.sum(Order.total_amount).desc()).limit(10).all()
+
+    return start_date, end_date
+
+
+@bp.route('/reports')
+@login_required
+@admin_required
+def reports():
+    """Báo cáo & thống kê"""
+    start_date, end_date = report_dates()
+    period = date_range(start_date, end_date)
+
+    daily_revenue = daily_revenue_query(period).all()
+    top_dishes = top_dishes_query(period).all()
+    order_types = order_types_query(period).all()
+    top_customers = top_customers_query(period).all()
     
     return render_template('admin/reports.html',
                          daily_revenue=daily_revenue,
@@ -916,6 +894,22 @@ def reports():
                          end_date=end_date)
 
 
+@bp.route('/export/<any(orders, payments, reports):dataset>.<any(csv, ndjson):fmt>')
+@login_required
+@admin_required
+def export_data(dataset, fmt):
+    """Xuất đơn hàng (kèm món), thanh toán hoặc số liệu báo cáo theo khoảng ngày"""
+    try:
+        start_date, end_date = report_dates()
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+
+    return export_response(
+        dataset, fmt, date_range(start_date, end_date),
+        filename=f'{dataset}_{start_date.isoformat()}_{end_date.isoformat()}'
+    )
+
+
 # ===== QUẢN LÝ NGUYÊN LIỆU MÓN ĂN =====
 @bp.route('/menu/<int:menu_id>/ingredients')
 @login_required
@@ -972,6 +966,7 @@ def add_menu_ingredient(menu_id):
 
     db.session.add(new_ingredient)
     db.session.commit()
+    invalidate_catalog()
 
     flash('Đã thêm nguyên liệu cho món ăn.', 'success')
     return redirect(url_for('admin.menu_ingredients', menu_id=menu_id))
@@ -993,6 +988,7 @@ def edit_menu_ingredient(ingredient_id):
                 return redirect(url_for('admin.menu_ingredients', menu_id=ingredient.menu_id))
             ingredient.quantity_needed = quantity_needed_float
             db.session.commit()
+            invalidate_catalog()
             flash('Đã cập nhật số lượng nguyên liệu.', 'success')
         except ValueError:
             flash('Số lượng nguyên liệu không hợp lệ.', 'warning')
@@ -1010,6 +1006,7 @@ def delete_menu_ingredient(ingredient_id):
 
     db.session.delete(ingredient)
     db.session.commit()
+    invalidate_catalog()
 
     flash('Đã xóa nguyên liệu khỏi món ăn.', 'success')
     return redirect(url_for('admin.menu_ingredients', menu_id=menu_id))
@@ -1069,6 +1066,7 @@ def assign_shipper(order_id):
             if order.status == 'ready':
                 order.status = 'delivering'
             db.session.commit()
+            publish_order_event(order, DELIVERY_TOPIC, shipper_id=order.shipper_id)
             flash(f'Đã gán shipper {shipper.name} cho đơn hàng #{order.order_id}.', 'success')
         else:
             flash('Shipper không hợp lệ.', 'danger')
@@ -1096,10 +1094,13 @@ def reservations():
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
 
-    reservations = query.order_by(Reservation.reservation_time.desc()).all()
+    page = keyset_paginate(query, Reservation.reservation_time, Reservation.reservation_id)
+    if wants_json():
+        return page_json(page)
 
     return render_template('admin/reservations.html',
-                         reservations=reservations,
+                         reservations=page.items,
+                         page=page,
                          status_filter=status_filter)
 
 
@@ -1,10 +1,19 @@
 
 
-from flask import Blueprint, render_template, request, jsonify, current_app
-from models import db, Menu, Table, Reservation
-from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, jsonify, current_app, abort, Response, stream_with_context
+from flask_login import login_required, current_user
+from models import db, Menu
+from datetime import datetime
 from sqlalchemy import func, desc
 import re
+from services.menu_catalog import get_catalog
+from services.menu_search import search_menu
+from services.availability import free_tables_at
+from services.chat_intents import IntentRouter
+from services.chat_cache import get_response_cache, cache_key, cache_metrics
+from services.ai_client import create_completion, stream_completion
+from services.events import format_sse
+from services.images import menu_image_url
 
 bp = Blueprint("chatbot", __name__, url_prefix="/chatbot")
 
@@ -14,16 +23,9 @@ def normalize_text(text: str) -> str:
 
 def find_menu_by_name(text):
  
-    words = normalize_text(text).split()
-
-    for word in words:
-        item = Menu.query.filter(
-            Menu.available == True,
-            Menu.name.ilike(f"%{word}%")
-        ).first()
-        if item:
-            return item
-    return None
+    # Món khớp nhiều từ nhất trong câu hỏi (không phân biệt dấu)
+    results = search_menu(normalize_text(text), match_all=False, prefix=False, limit=1)
+    return results[0] if results else None
 
 
 def build_menu_response(item: Menu, note: str = None):
@@ -49,10 +51,7 @@ def build_menu_response(item: Menu, note: str = None):
     return {
         "success": True,
         "message": message.strip(),
-        "image": (
-            f"/static/images/menu/{item.image_url}"
-            if item.image_url else None
-        ),
+        "image": menu_image_url(item),
         "timestamp": datetime.now().strftime("%H:%M"),
     }
 
@@ -67,6 +66,7 @@ def get_best_sellers(limit=5):
             Menu.price,
             Menu.calories,
             Menu.image_url,
+            Menu.image_variants,
             func.sum(OrderItem.quantity).label("total_sold"),
         )
         .join(OrderItem, Menu.menu_id == OrderItem.menu_id)
@@ -79,26 +79,7 @@ def get_best_sellers(limit=5):
 
 
 def check_table_availability():
-    now = datetime.now()
-
-    reserved_ids = (
-        db.session.query(Reservation.table_id)
-        .filter(
-            Reservation.status.in_(["pending", "confirmed"]),
-            Reservation.reservation_time.between(
-                now - timedelta(hours=2),
-                now + timedelta(hours=2),
-            ),
-        )
-        .all()
-    )
-
-    reserved_ids = [r[0] for r in reserved_ids]
-
-    count = Table.query.filter(
-        Table.status == "available",
-        ~Table.table_id.in_(reserved_ids),
-    ).count()
+    count = len(free_tables_at(datetime.now()))
 
     return count > 0, count
 
@@ -143,118 +124,158 @@ def quick_questions():
 
 
 # ======================================================
-# 6. CHAT API
+# 6. INTENT ROUTER (TRẢ LỜI TỪ DATABASE TRƯỚC KHI GỌI MODEL)
+# ======================================================
+
+def answer_menu_info(user_message):
+    item = find_menu_by_name(user_message)
+    return build_menu_response(item) if item else None
+
+
+def answer_diet(user_message):
+    items = sorted(
+        (m for m in get_catalog().items if m.calories is not None and m.calories <= 500),
+        key=lambda m: m.calories
+    )[:5]
+    if not items:
+        return None
+
+    text = "🥗 **Món phù hợp cho ăn kiêng:**\n"
+    for m in items:
+        text += f"- {m.name}: {m.calories} kcal\n"
+
+    return {
+        "success": True,
+        "message": text,
+        "image": menu_image_url(items[0]),
+        "timestamp": datetime.now().strftime("%H:%M"),
+    }
+
+
+def answer_best_sellers(user_message):
+    best = get_best_sellers()
+    if not best:
+        return None
+
+    text = "🔥 **Món bán chạy nhất:**\n"
+    for name, price, cal, img, variants, sold in best:
+        text += f"- {name}: {price:,.0f}đ ({sold} phần)\n"
+
+    return {
+        "success": True,
+        "message": text,
+        "image": menu_image_url(best[0]),
+        "timestamp": datetime.now().strftime("%H:%M"),
+    }
+
+
+def answer_tables(user_message):
+    has_table, count = check_table_availability()
+    return {
+        "success": True,
+        "message": (
+            f"✅ Hiện còn **{count} bàn trống**."
+            if has_table else
+            "❌ Hiện tại không còn bàn trống."
+        ),
+        "timestamp": datetime.now().strftime("%H:%M"),
+    }
+
+
+def answer_opening_hours(user_message):
+    return {
+        "success": True,
+        "message": (
+            f"🕙 Nhà hàng mở cửa từ **{current_app.config['RESERVATION_OPENING_TIME']}** "
+            f"đến **{current_app.config['RESERVATION_CLOSING_TIME']}** hằng ngày."
+        ),
+        "timestamp": datetime.now().strftime("%H:%M"),
+    }
+
+
+# Theo thứ tự ưu tiên; ý định khớp nhưng không có dữ liệu (trả None) sẽ nhường cho ý định tiếp theo
+INTENTS = [
+    ("menu_info", ["giá", "calo", "calories", "ăn kiêng", "béo"], answer_menu_info),
+    ("diet", ["ăn kiêng", "ít calo", "an kieng", "it calo"], answer_diet),
+    ("best_sellers", ["bán chạy", "ban chay"], answer_best_sellers),
+    ("tables", ["bàn", "đặt bàn", "dat ban"], answer_tables),
+    ("opening_hours", ["mở cửa", "đóng cửa", "giờ mở", "mo cua", "dong cua"], answer_opening_hours),
+]
+INTENT_HANDLERS = {name: handler for name, _, handler in INTENTS}
+intent_router = IntentRouter([(name, keywords) for name, keywords, _ in INTENTS])
+
+
+def route_message(user_message):
+    """(ý định, câu trả lời từ database) cho ý định đầu tiên trả lời được, hoặc (None, None)"""
+    for intent in intent_router.match(user_message):
+        response = INTENT_HANDLERS[intent](user_message)
+        if response is not None:
+            return intent, response
+    return None, None
+
+
+# ======================================================
+# 7. CHAT API
 # ======================================================
 
+def read_chat_request():
+    data = request.get_json(silent=True) or {}
+    return data.get("message", "").strip(), data.get("history", [])
+
+
+def model_messages(user_message, history):
+    messages = [{"role": "system", "content": get_system_prompt()}]
+    for h in history[-6:]:
+        messages.append(h)
+
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+def cached_answer(user_message, history):
+    """(khóa cache, câu trả lời đã cache). Câu hỏi mở đầu (chưa có ngữ cảnh hội thoại) mới được cache"""
+    key = cache_key(user_message, get_catalog().version) if not history else None
+    return key, (get_response_cache().get(key) if key else None)
+
+
+def with_timestamp(answer):
+    return dict(answer, success=True, timestamp=datetime.now().strftime("%H:%M"))
+
+
 @bp.route("/api/chat", methods=["POST"])
 def chat():
     try:
-        data = request.get_json()
-        user_message = data.get("message", "").strip()
-        history = data.get("history", [])
+        user_message, history = read_chat_request()
 
         if not user_message:
             return jsonify({"success": False, "message": "Tin nhắn trống"})
 
-        msg = user_message.lower()
+        intent, response = route_message(user_message)
+        if response is not None:
+            intent_router.record(intent)
+            return jsonify(response)
 
-        # --------------------------------------------------
-        # (A) HỎI GIÁ / CALORIES MÓN
-        # --------------------------------------------------
-        if any(k in msg for k in ["giá", "calo", "calories", "ăn kiêng", "béo"]):
-            item = find_menu_by_name(user_message)
-            if item:
-                return jsonify(build_menu_response(item))
+        intent_router.record(IntentRouter.FALLBACK)
 
         # --------------------------------------------------
-        # (B) GỢI Ý ĂN KIÊNG
+        # FALLBACK GPT
         # --------------------------------------------------
-        if "ăn kiêng" in msg or "ít calo" in msg:
-            items = (
-                Menu.query.filter(
-                    Menu.available == True,
-                    Menu.calories.isnot(None),
-                    Menu.calories <= 500
-                )
-                .order_by(Menu.calories)
-                .limit(5)
-                .all()
-            )
-
-            if items:
-                text = "🥗 **Món phù hợp cho ăn kiêng:**\n"
-                for m in items:
-                    text += f"- {m.name}: {m.calories} kcal\n"
-
-                return jsonify({
-                    "success": True,
-                    "message": text,
-                    "image": (
-                        f"/static/images/menu/{items[0].image_url}"
-                        if items[0].image_url else None
-                    ),
-                    "timestamp": datetime.now().strftime("%H:%M"),
-                })
+        key, cached = cached_answer(user_message, history)
+        if cached is not None:
+            return jsonify(with_timestamp(cached))
 
-        # --------------------------------------------------
-        # (C) BEST SELLER
-        # --------------------------------------------------
-        if "bán chạy" in msg:
-            best = get_best_sellers()
-            if best:
-                text = "🔥 **Món bán chạy nhất:**\n"
-                for name, price, cal, img, sold in best:
-                    text += f"- {name}: {price:,.0f}đ ({sold} phần)\n"
-
-                return jsonify({
-                    "success": True,
-                    "message": text,
-                    "image": (
-                        f"/static/images/menu/{best[0].image_url}"
-                        if best[0].image_url else None
-                    ),
-                    "timestamp": datetime.now().strftime("%H:%M"),
-                })
-
-        # --------------------------------------------------
-        # (D) BÀN TRỐNG
-        # --------------------------------------------------
-        if any(k in msg for k in ["bàn", "đặt bàn"]):
-            has_table, count = check_table_availability()
-            return jsonify({
-                "success": True,
-                "message": (
-                    f"✅ Hiện còn **{count} bàn trống**."
-                    if has_table else
-                    "❌ Hiện tại không còn bàn trống."
-                ),
-                "timestamp": datetime.now().strftime("%H:%M"),
-            })
-
-        # --------------------------------------------------
-        # (E) FALLBACK GPT
-        # --------------------------------------------------
-        from openai import OpenAI
-        client = OpenAI(api_key=current_app.config["OPENAI_API_KEY"])
-
-        messages = [{"role": "system", "content": get_system_prompt()}]
-        for h in history[-6:]:
-            messages.append(h)
-
-        messages.append({"role": "user", "content": user_message})
-
-        res = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
+        res = create_completion(
+            messages=model_messages(user_message, history),
             temperature=0.6,
             max_tokens=300,
+            timeout=current_app.config["CHATBOT_TIMEOUT_SECONDS"],
         )
 
-        return jsonify({
-            "success": True,
-            "message": res.choices[0].message.content,
-            "timestamp": datetime.now().strftime("%H:%M"),
-        })
+        answer = {"message": res.choices[0].message.content}
+        if key:
+            get_response_cache().set(key, answer)
+
+        return jsonify(with_timestamp(answer))
 
     except Exception as e:
         current_app.logger.error(e)
@@ -264,3 +285,72 @@ def chat():
         })
 
 
+@bp.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """Như /api/chat nhưng trả về SSE: các sự kiện {"delta"} theo từng đoạn text, kết thúc bằng
+    event "done" (câu trả lời đầy đủ, ảnh, thời gian) hoặc event "error"
+    """
+    user_message, history = read_chat_request()
+    if not user_message:
+        return jsonify({"success": False, "message": "Tin nhắn trống"}), 400
+
+    # Câu trả lời từ database/cache được tính ngay trong request, luồng model không giữ kết nối database
+    key = messages = None
+    intent, answer = route_message(user_message)
+    if answer is not None:
+        intent_router.record(intent)
+    else:
+        intent_router.record(IntentRouter.FALLBACK)
+        key, answer = cached_answer(user_message, history)
+        if answer is not None:
+            answer = with_timestamp(answer)
+        else:
+            messages = model_messages(user_message, history)
+    db.session.close()
+
+    config = current_app.config
+
+    def generate():
+        if answer is not None:
+            yield format_sse({"delta": answer["message"]})
+            yield format_sse(answer, event="done")
+            return
+
+        parts = []
+        try:
+            for text in stream_completion(
+                messages=messages,
+                temperature=0.6,
+                max_tokens=300,
+                timeout=config["CHATBOT_TIMEOUT_SECONDS"],
+                max_seconds=config["CHATBOT_STREAM_MAX_SECONDS"],
+            ):
+                parts.append(text)
+                yield format_sse({"delta": text})
+        except Exception as e:
+            current_app.logger.error(e)
+            yield format_sse({"success": False, "message": "Chatbot đang bận, vui lòng thử lại sau."}, event="error")
+            return
+
+        result = {"message": "".join(parts)}
+        if key:
+            get_response_cache().set(key, result)
+        yield format_sse(with_timestamp(result), event="done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@bp.route("/api/metrics", methods=["GET"])
+@login_required
+def metrics():
+    """Tỉ lệ câu hỏi trả lời từ database và tỉ lệ hit cache (trong process hiện tại)"""
+    if current_user.role != "admin":
+        abort(403)
+    return jsonify({
+        "router": intent_router.metrics(),
+        "cache": cache_metrics(),
+    })
@@ -2,11 +2,22 @@
 Customer Routes
 Các chức năng dành cho khách hàng
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session, abort, Response, current_app
 from flask_login import login_required, current_user
 from models import db, Menu, Order, OrderItem, Table, Reservation, Payment, Feedback, Promotion, Inventory, MenuIngredient
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, insert, update
+from services.engine import run_in_write_transaction
+from services.inventory import reserve_stock, release_stock, InsufficientStock
+from services.events import publish_order_event, event_stream_response, order_topic, KITCHEN_TOPIC
+from services.order_version import order_etag
+from services.menu_catalog import get_catalog
+from services.menu_search import search_menu
+from services.availability import (
+    table_is_free, free_tables_at, availability_grid, availability_version, availability_fingerprint
+)
+from services.pagination import keyset_paginate, wants_json, page_json
+from services.user_cache import invalidate_users
 
 # Số tiền cọc cố định cho bàn thứ 2 trở đi (cùng thời điểm)
 DEPOSIT_AMOUNT = 200000  # 200.000 VND
@@ -70,21 +81,20 @@ def menu():
     category = request.args.get('category', 'all')
     search = request.args.get('search', '')
     
-    query = Menu.query.filter_by(available=True)
-    
-    if category != 'all':
-        query = query.filter_by(category=category)
+    # Đọc từ catalog đã cache (không truy vấn database khi menu chưa đổi)
+    catalog = get_catalog()
     
     if search:
-        query = query.filter(Menu.name.contains(search))
-    
-    menu_items = query.all()
+        # Tìm không dấu theo tên/mô tả, xếp theo độ liên quan
+        menu_items = [
+            item for item in search_menu(search)
+            if category == 'all' or item.category == category
+        ]
+    else:
+        menu_items = catalog.in_category(category)
     
     # Đếm số lượng theo category
-    categories = db.session.query(
-        Menu.category, 
-        func.count(Menu.menu_id)
-    ).filter_by(available=True).group_by(Menu.category).all()
+    categories = catalog.categories
     
     return render_template('customer/menu.html',
                          menu_items=menu_items,
@@ -137,17 +147,8 @@ def reservation():
             flash(f'Bàn chỉ chứa tối đa {table.capacity} người.', 'warning')
             return redirect(url_for('customer.reservation'))
 
-        # Kiểm tra bàn đã được đặt chưa (trong khoảng ±2 giờ)
-        existing_table = Reservation.query.filter(
-            Reservation.table_id == table_id,
-            Reservation.status.in_(['pending', 'confirmed']),
-            Reservation.reservation_time.between(
-                reservation_datetime - timedelta(hours=2),
-                reservation_datetime + timedelta(hours=2)
-            )
-        ).first()
-
-        if existing_table:
+        # Kiểm tra bàn đã được đặt chưa (lượt đặt giao với khung 2 giờ của lượt mới)
+        if not table_is_free(table.table_id, reservation_datetime):
             flash('Bàn này đã được đặt vào thời gian đó. Vui lòng chọn bàn hoặc thời gian khác.', 'warning')
             return redirect(url_for('customer.reservation'))
 
@@ -234,6 +235,18 @@ def my_reservations():
                          reservations=reservations)
 
 
+def parse_cart(cart_items):
+    """Chuyển danh sách 'menu_id:quantity' thành {menu_id: quantity} (gộp món trùng)"""
+    cart = {}
+    for item_data in cart_items:
+        menu_id, quantity = item_data.split(':')
+        menu_id, quantity = int(menu_id), int(quantity)
+        if quantity <= 0:
+            raise ValueError(f'Số lượng không hợp lệ: {item_data}')
+        cart[menu_id] = cart.get(menu_id, 0) + quantity
+    return cart
+
+
 @bp.route('/order/new', methods=['POST'])
 @login_required
 @customer_required
@@ -249,49 +262,55 @@ def new_order():
         flash('Vui lòng chọn ít nhất một món.', 'warning')
         return redirect(url_for('customer.menu'))
 
-    # Kiểm tra nguyên liệu trước khi đặt (với lock để tránh race condition)
+    # Phân tích giỏ hàng 1 lần: {menu_id: quantity}
     try:
-        insufficient_ingredients = []
-
-        # Thu thập tất cả inventory_id cần kiểm tra
-        inventory_ids_to_check = set()
-        for item_data in cart_items:
-            menu_id, quantity = item_data.split(':')
-            menu_item = Menu.query.get(menu_id)
-            if menu_item:
-                for ingredient in menu_item.ingredients:
-                    inventory_ids_to_check.add(ingredient.inventory_id)
-
-        # Lock các inventory rows để tránh race condition
-        locked_inventories = {
+        cart = parse_cart(cart_items)
+    except ValueError:
+        flash('Giỏ hàng không hợp lệ.', 'warning')
+        return redirect(url_for('customer.menu'))
+
+    # Lượng nguyên liệu cần theo inventory và các món dùng nó (dùng cho thông báo thiếu hàng)
+    needed_by_inventory = {}
+    menus_by_inventory = {}
+
+    def place_order():
+        """Tạo đơn và trừ kho trong 1 transaction ghi (có thể chạy lại khi tranh chấp khóa)"""
+        # Giá, trạng thái phục vụ và nguyên liệu đọc từ database trong transaction ghi,
+        # không lấy từ catalog (worker khác có thể chưa thấy thay đổi menu)
+        menus = {
+            m.menu_id: m
+            for m in Menu.query.options(db.selectinload(Menu.ingredients)).filter(
+                Menu.menu_id.in_(cart.keys()), Menu.available.is_(True)
+            )
+        }
+        if not menus:
+            return None
+
+        # Tổng lượng nguyên liệu cần cho cả giỏ hàng: {inventory_id: needed}
+        needed_by_inventory.clear()
+        menus_by_inventory.clear()
+        for menu_id, quantity in cart.items():
+            menu_item = menus.get(menu_id)
+            if not menu_item:
+                continue
+            for ingredient in menu_item.ingredients:
+                needed_by_inventory[ingredient.inventory_id] = (
+                    needed_by_inventory.get(ingredient.inventory_id, 0)
+                    + ingredient.quantity_needed * quantity
+                )
+                menus_by_inventory.setdefault(ingredient.inventory_id, []).append(menu_item.name)
+
+        # Đọc giá vốn (PostgreSQL: khóa dòng; SQLite: đã giữ write lock từ BEGIN IMMEDIATE)
+        inventories = {
             inv.item_id: inv
             for inv in Inventory.query.filter(
-                Inventory.item_id.in_(inventory_ids_to_check)
+                Inventory.item_id.in_(needed_by_inventory.keys())
             ).with_for_update().all()
         }
 
-        # Kiểm tra đủ nguyên liệu không
-        for item_data in cart_items:
-            menu_id, quantity = item_data.split(':')
-            quantity = int(quantity)
-            menu_item = Menu.query.get(menu_id)
-
-            if menu_item:
-                for ingredient in menu_item.ingredients:
-                    inv = locked_inventories.get(ingredient.inventory_id)
-                    if inv:
-                        needed = ingredient.quantity_needed * quantity
-                        if inv.quantity < needed:
-                            insufficient_ingredients.append(
-                                f"{menu_item.name} (thiếu {inv.name}: cần {needed:.2f} {inv.unit}, còn {inv.quantity:.2f})"
-                            )
-
-        if insufficient_ingredients:
-            db.session.rollback()  # Release locks
-            flash(f'Không đủ nguyên liệu: {", ".join(insufficient_ingredients)}', 'danger')
-            return redirect(url_for('customer.menu'))
-
-        # Tạo đơn hàng mới (vẫn trong transaction với lock)
+        # Trừ kho nguyên tử: UPDATE ... WHERE quantity >= needed, thiếu hàng -> InsufficientStock
+        reserve_stock(needed_by_inventory)
+
         new_order = Order(
             customer_id=current_user.user_id,
             table_id=table_id,
@@ -304,40 +323,58 @@ def new_order():
         db.session.add(new_order)
         db.session.flush()
 
-        for item_data in cart_items:
-            menu_id, quantity = item_data.split(':')
-            quantity = int(quantity)
-            menu_item = Menu.query.get(menu_id)
-
-            if menu_item and menu_item.available:
-                # Thêm order item
-                db.session.add(OrderItem(
-                    order_id=new_order.order_id,
-                    menu_id=menu_id,
-                    quantity=quantity,
-                    price=menu_item.price,
-                    status='pending'
-                ))
-
-                # TRỪ NGUYÊN LIỆU TRONG KHO (sử dụng locked inventory)
-                for ingredient in menu_item.ingredients:
-                    inv = locked_inventories.get(ingredient.inventory_id)
-                    if inv:
-                        needed = ingredient.quantity_needed * quantity
-                        inv.quantity -= needed
-                        inv.last_updated = datetime.utcnow()
-
-        new_order.calculate_total()
-        db.session.commit()
+        order_items = []
+        for menu_id, quantity in cart.items():
+            menu_item = menus.get(menu_id)
+            if not menu_item:
+                continue
+
+            # Chốt giá vốn 1 phần theo giá nhập hiện tại
+            unit_cost = sum(
+                ingredient.quantity_needed * (inventories[ingredient.inventory_id].unit_cost or 0)
+                for ingredient in menu_item.ingredients
+                if ingredient.inventory_id in inventories
+            )
 
-        flash('Đặt hàng thành công!', 'success')
-        return redirect(url_for('customer.menu', order_success='true'))
+            order_items.append({
+                'order_id': new_order.order_id,
+                'menu_id': menu_id,
+                'quantity': quantity,
+                'price': menu_item.price,
+                'status': 'pending',
+                'unit_cost_snapshot': unit_cost,
+                'line_cost': unit_cost * quantity,
+            })
 
+        # Thêm tất cả order item trong 1 lệnh INSERT
+        db.session.execute(insert(OrderItem), order_items)
+
+        new_order.total_amount = sum(item['price'] * item['quantity'] for item in order_items)
+        return new_order.order_id
+
+    try:
+        order_id = run_in_write_transaction(place_order)
+    except InsufficientStock as e:
+        insufficient_ingredients = [
+            f"{', '.join(menus_by_inventory[inv.item_id])} (thiếu {inv.name}: cần {needed_by_inventory[inv.item_id]:.2f} {inv.unit}, còn {inv.quantity:.2f})"
+            for inv in Inventory.query.filter(Inventory.item_id.in_(e.inventory_ids)).all()
+        ]
+        flash(f'Không đủ nguyên liệu: {", ".join(insufficient_ingredients)}', 'danger')
+        return redirect(url_for('customer.menu'))
     except Exception as e:
         db.session.rollback()
         flash(f'Có lỗi xảy ra khi đặt hàng: {str(e)}', 'danger')
         return redirect(url_for('customer.menu'))
 
+    if order_id is None:
+        flash('Các món đã chọn hiện không còn phục vụ.', 'warning')
+        return redirect(url_for('customer.menu'))
+
+    publish_order_event(db.session.get(Order, order_id), KITCHEN_TOPIC)
+
+    flash('Đặt hàng thành công!', 'success')
+    return redirect(url_for('customer.menu', order_success='true'))
+
 
 
 
@@ -349,15 +386,20 @@ def my_orders():
     """Xem đơn hàng của tôi"""
     status_filter = request.args.get('status', 'all')
     
-    query = Order.query.filter_by(customer_id=current_user.user_id)
+    query = Order.query.options(
+        db.selectinload(Order.order_items)
+    ).filter_by(customer_id=current_user.user_id)
     
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    orders = query.order_by(Order.order_time.desc()).all()
+    page = keyset_paginate(query, Order.order_time, Order.order_id)
+    if wants_json():
+        return page_json(page)
     
     return render_template('customer/my_orders.html',
-                         orders=orders,
+                         orders=page.items,
+                         page=page,
                          status_filter=status_filter)
 
 
@@ -408,18 +450,41 @@ def cancel_order(order_id):
         flash('Chỉ có thể hủy đơn hàng đang chờ xử lý.', 'warning')
         return redirect(url_for('customer.order_detail', order_id=order_id))
 
-    # HOÀN TRẢ NGUYÊN LIỆU VÀO KHO
+    # HOÀN TRẢ NGUYÊN LIỆU VÀO KHO (cộng nguyên tử, không ghi đè số lượng)
+    restored = {}
     for order_item in order.order_items:
         menu_item = order_item.menu_item
         if menu_item:
             for ingredient in menu_item.ingredients:
-                # Cộng lại nguyên liệu đã trừ
-                restored = ingredient.quantity_needed * order_item.quantity
-                ingredient.inventory.quantity += restored
-                ingredient.inventory.last_updated = datetime.utcnow()
+                restored[ingredient.inventory_id] = (
+                    restored.get(ingredient.inventory_id, 0)
+                    + ingredient.quantity_needed * order_item.quantity
+                )
+
+    def cancel():
+        # Đổi trạng thái có điều kiện: khi 2 request hủy cùng lúc chỉ 1 request cập nhật được
+        # (rowcount = 1) và hoàn kho, request kia không hoàn kho lần nữa
+        result = db.session.execute(
+            update(Order)
+            .where(Order.order_id == order_id, Order.status == 'pending')
+            .values(
+                status='cancelled',
+                version=func.coalesce(Order.version, 0) + 1,
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return False
+        release_stock(restored)
+        return True
 
-    order.status = 'cancelled'
-    db.session.commit()
+    if not run_in_write_transaction(cancel):
+        flash('Chỉ có thể hủy đơn hàng đang chờ xử lý.', 'warning')
+        return redirect(url_for('customer.order_detail', order_id=order_id))
+
+    db.session.refresh(order)
+    publish_order_event(order, KITCHEN_TOPIC)
 
     flash('Đã hủy đơn hàng và hoàn trả nguyên liệu.', 'info')
     return redirect(url_for('customer.my_orders'))
@@ -512,6 +577,7 @@ def update_profile():
         current_user.phone = phone
     
     db.session.commit()
+    invalidate_users()
     
     flash('Cập nhật thông tin thành công!', 'success')
     return redirect(url_for('customer.profile'))
@@ -522,11 +588,48 @@ def update_profile():
 @login_required
 @customer_required
 def get_order_status(order_id):
-    order = Order.query.get_or_404(order_id)
-
-    if order.customer_id != current_user.user_id:
+    # Chỉ đọc tem phiên bản trước, trả 304 nếu client đã có dữ liệu mới nhất
+    stamp = db.session.query(
+        Order.customer_id, Order.version, Order.updated_at, Order.order_time
+    ).filter(Order.order_id == order_id).first()
+    if stamp is None:
+        abort(404)
+
+    if stamp.customer_id != current_user.user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
+    etag = order_etag(order_id, stamp.version)
+    last_modified = (stamp.updated_at or stamp.order_time).replace(microsecond=0)
+
+    # ETag (theo version) được ưu tiên; có If-None-Match thì bỏ qua If-Modified-Since
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        # Last-Modified chỉ chính xác tới giây: thay đổi trong cùng giây với bản của client
+        # không phân biệt được, nên chỉ trả 304 khi đơn không đổi từ trước giây đó
+        since = request.if_modified_since
+        not_modified = since is not None and last_modified < since.replace(tzinfo=None)
+
+    if not_modified:
+        response = Response(status=304)
+    else:
+        order = Order.query.options(
+            db.selectinload(Order.order_items).joinedload(OrderItem.menu_item),
+            db.selectinload(Order.order_items).joinedload(OrderItem.chef),
+            db.joinedload(Order.payment),
+            db.joinedload(Order.shipper)
+        ).filter(Order.order_id == order_id).one()
+        response = jsonify(_order_status_payload(order))
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _order_status_payload(order):
+    """Dữ liệu JSON trạng thái đơn hàng"""
     # Thông tin shipper (nếu có)
     shipper_info = None
     if order.shipper:
@@ -535,7 +638,7 @@ def get_order_status(order_id):
             'phone': order.shipper.phone
         }
 
-    return jsonify({
+    return {
         'order_id': order.order_id,
         'status': order.status,
         'order_type': order.order_type,
@@ -550,7 +653,62 @@ def get_order_status(order_id):
         } for item in order.order_items],
         'payment_status': order.payment.payment_status if order.payment else None,
         'shipper': shipper_info
-    })
+    }
+
+
+@bp.route('/api/availability-grid')
+@login_required
+@customer_required
+def availability_grid_api():
+    """Lưới bàn trống theo slot 15 phút của 1 ngày (cache được đến lần đặt bàn tiếp theo)"""
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+        guests = request.args.get('guests', type=int)
+    except ValueError:
+        return jsonify({'error': 'Invalid parameters'}), 400
+
+    etag = f'grid-{day.isoformat()}-{guests or 0}-{availability_version()}-{availability_fingerprint(day)}'
+
+    # Slot đã qua không đặt được: với hôm nay, ETag đổi theo cả mốc slot hiện tại
+    now = datetime.utcnow()
+    if day == now.date():
+        etag += f"-{(now.hour * 60 + now.minute) // current_app.config['RESERVATION_SLOT_MINUTES']}"
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        slots, rows = availability_grid(day, guests, now=now)
+        response = jsonify({
+            'date': day.isoformat(),
+            'guests': guests,
+            'slot_minutes': current_app.config['RESERVATION_SLOT_MINUTES'],
+            'slots': [slot.strftime('%H:%M') for slot in slots],
+            'tables': [{
+                'table_id': table.table_id,
+                'table_number': table.table_number,
+                'capacity': table.capacity,
+                'location': table.location,
+                'available': available
+            } for table, available in rows]
+        })
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@bp.route('/api/order/<int:order_id>/events')
+@login_required
+@customer_required
+def order_events(order_id):
+    """Luồng SSE trạng thái đơn hàng (thay cho tải lại trang định kỳ)"""
+    order = Order.query.get_or_404(order_id)
+
+    if order.customer_id != current_user.user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return event_stream_response([order_topic(order_id)])
 
 
 @bp.route('/api/check-table-availability')
@@ -564,22 +722,13 @@ def check_table_availability():
     if not date or not time:
         return jsonify({'error': 'Missing parameters'}), 400
     
-    reservation_datetime = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
-    
-    reserved_tables = db.session.query(Reservation.table_id).filter(
-        Reservation.status.in_(['pending', 'confirmed']),
-        Reservation.reservation_time.between(
-            reservation_datetime - timedelta(hours=2),
-            reservation_datetime + timedelta(hours=2)
-        )
-    ).all()
-    
-    reserved_ids = [t[0] for t in reserved_tables]
+    try:
+        reservation_datetime = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+        guests = request.args.get('guests', type=int)
+    except ValueError:
+        return jsonify({'error': 'Invalid parameters'}), 400
     
-    available_tables = Table.query.filter(
-        Table.status == 'available',
-        ~Table.table_id.in_(reserved_ids)
-    ).all()
+    available_tables = free_tables_at(reservation_datetime, guests)
     
     return jsonify({
         'available_tables': [
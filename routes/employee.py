@@ -5,8 +5,14 @@ Các chức năng dành cho nhân viên
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from models import db, Order, OrderItem, Table, Reservation, Payment, Menu, Promotion, User
-from datetime import datetime, date
-from sqlalchemy import func
+from datetime import datetime
+from sqlalchemy import func, update
+from services.engine import run_in_write_transaction
+from services.rollup import record_payment, record_completed_order
+from services.timerange import day_range, in_range
+from services.events import publish_order_event, event_stream_response, KITCHEN_TOPIC, DELIVERY_TOPIC
+from services.kitchen import kitchen_queue, queue_counts, completed_today, kitchen_tickets, parse_cursor
+from services.pagination import keyset_paginate, wants_json, page_json
 
 bp = Blueprint('employee', __name__, url_prefix='/employee')
 
@@ -37,12 +43,12 @@ def dashboard():
         
         # Đơn hàng hôm nay
         today_orders = Order.query.filter(
-            db.func.date(Order.order_time) == date.today()
+            in_range(Order.order_time, day_range(date.today()))
         ).count()
         
         # Đặt bàn hôm nay
         today_reservations = Reservation.query.filter(
-            db.func.date(Reservation.reservation_time) == date.today()
+            in_range(Reservation.reservation_time, day_range(date.today()))
         ).count()
         
         # Bàn đang hoạt động
@@ -66,20 +72,8 @@ def dashboard():
     
     elif current_user.employee_type == 'chef':
         # Nhân viên bếp: xem món cần nấu
-        preparing_items = OrderItem.query.join(Order).filter(
-            Order.status.in_(['pending', 'preparing']),
-            OrderItem.status.in_(['pending', 'preparing'])
-        ).order_by(Order.order_time).all()
-        
-        pending_count = OrderItem.query.join(Order).filter(
-            Order.status.in_(['pending', 'preparing']),
-            OrderItem.status == 'pending'
-        ).count()
-        
-        preparing_count = OrderItem.query.join(Order).filter(
-            Order.status.in_(['pending', 'preparing']),
-            OrderItem.status == 'preparing'
-        ).count()
+        preparing_items = kitchen_queue()
+        pending_count, preparing_count = queue_counts(preparing_items)
         
         return render_template('employee/chef_dashboard.html',
                              preparing_items=preparing_items,
@@ -93,7 +87,7 @@ def dashboard():
         
         today_revenue = db.session.query(db.func.sum(Payment.final_amount)).filter(
             Payment.payment_status == 'completed',
-            db.func.date(Payment.payment_time) == datetime.utcnow().date()
+            in_range(Payment.payment_time, day_range(datetime.utcnow().date()))
         ).scalar() or 0
         
         ready_orders = Order.query.options(
@@ -144,7 +138,7 @@ def dashboard():
             Order.order_type == 'delivery',
             Order.status == 'completed',
             Order.shipper_id == current_user.user_id,
-            db.func.date(Order.completed_time) == date.today()
+            in_range(Order.completed_time, day_range(date.today()))
         ).count()
 
         # Tổng đơn tôi đã giao
@@ -228,10 +222,13 @@ def reservations():
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    reservations = query.order_by(Reservation.reservation_time.asc()).all()
+    page = keyset_paginate(query, Reservation.reservation_time, Reservation.reservation_id, descending=False)
+    if wants_json():
+        return page_json(page)
     
     return render_template('employee/reservations.html',
-                         reservations=reservations,
+                         reservations=page.items,
+                         page=page,
                          status_filter=status_filter)
 
 @bp.route('/reservation/<int:reservation_id>/confirm', methods=['POST'])
@@ -288,10 +285,19 @@ def orders():
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    orders = query.order_by(Order.order_time.desc()).all()
+    page = keyset_paginate(query, Order.order_time, Order.order_id)
+    if wants_json():
+        return page_json(page)
+
+    # Thống kê theo trạng thái trên toàn bộ đơn (không chỉ trang hiện tại)
+    status_counts = dict(
+        db.session.query(Order.status, func.count(Order.order_id)).group_by(Order.status).all()
+    )
     
     return render_template('employee/orders.html',
-                         orders=orders,
+                         orders=page.items,
+                         page=page,
+                         status_counts=status_counts,
                          status_filter=status_filter)
 
 
@@ -313,23 +319,9 @@ def kitchen():
         flash('Chức năng này chỉ dành cho nhân viên bếp.', 'warning')
         return redirect(url_for('employee.dashboard'))
 
-    preparing_items = OrderItem.query.join(Order).options(
-        db.joinedload(OrderItem.menu_item),
-        db.joinedload(OrderItem.order).joinedload(Order.table)
-    ).filter(
-        OrderItem.status.in_(['pending', 'preparing'])
-    ).order_by(Order.order_time).all()
-
-    pending_count = sum(1 for i in preparing_items if i.status == 'pending')
-    preparing_count = sum(1 for i in preparing_items if i.status == 'preparing')
-
-    completed_items_today = OrderItem.query.join(Order).options(
-        db.joinedload(OrderItem.menu_item),
-        db.joinedload(OrderItem.order).joinedload(Order.table)
-    ).filter(
-        OrderItem.status == 'completed',
-        db.func.date(Order.completed_time) == date.today()
-    ).order_by(Order.completed_time.desc()).all()
+    preparing_items = kitchen_queue()
+    pending_count, preparing_count = queue_counts(preparing_items)
+    completed_items_today = completed_today()
 
     return render_template(
         'employee/chef_dashboard.html',
@@ -359,6 +351,9 @@ def start_cooking(item_id):
 
     db.session.commit()
 
+    publish_order_event(order_item.order, KITCHEN_TOPIC,
+                        order_item_id=order_item.order_item_id, item_status=order_item.status)
+
     flash(f'Đã bắt đầu nấu món {order_item.menu_item.name}.', 'success')
     return redirect(url_for('employee.kitchen'))
 
@@ -388,10 +383,43 @@ def complete_cooking(item_id):
         order_item.order.completed_time = datetime.utcnow()
     db.session.commit()
 
+    topics = [KITCHEN_TOPIC]
+    if all_completed and order_item.order.order_type == 'delivery':
+        topics.append(DELIVERY_TOPIC)
+    publish_order_event(order_item.order, *topics,
+                        order_item_id=order_item.order_item_id, item_status=order_item.status)
+
     flash(f'Món {order_item.menu_item.name} đã hoàn thành.', 'success')
     return redirect(url_for('employee.kitchen'))
 
 
+@bp.route('/api/kitchen')
+@login_required
+@employee_required
+def kitchen_tickets_api():
+    """Phiếu bếp theo đơn/bàn; ?since=<cursor> chỉ trả các đơn thay đổi sau cursor"""
+    if current_user.employee_type != 'chef':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        since = parse_cursor(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    return jsonify(kitchen_tickets(since))
+
+
+@bp.route('/api/kitchen/events')
+@login_required
+@employee_required
+def kitchen_events():
+    """Luồng SSE thay đổi món trong bếp"""
+    if current_user.employee_type != 'chef':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return event_stream_response([KITCHEN_TOPIC])
+
+
 # Chức năng cho Cashier
 @bp.route('/payments')
 @login_required
@@ -412,7 +440,11 @@ def payments():
     if status_filter != 'all':
         query = query.filter(Payment.payment_status == status_filter)
 
-    payments = query.order_by(Payment.payment_time.desc()).all()
+    page = keyset_paginate(query, Payment.payment_time, Payment.payment_id, nullable=True)
+    if wants_json():
+        return page_json(page)
+
+    payment_count = query.count()
 
     pending_payments = Order.query.filter_by(status='ready').count()
 
@@ -420,7 +452,7 @@ def payments():
         func.coalesce(func.sum(Payment.final_amount), 0)
     ).filter(
         Payment.payment_status == 'completed',
-        func.date(Payment.payment_time) == datetime.utcnow().date()
+        in_range(Payment.payment_time, day_range(datetime.utcnow().date()))
     ).scalar()
 
     recent_payments = (
@@ -433,7 +465,9 @@ def payments():
 
     return render_template(
         'employee/payments.html',
-        payments=payments,
+        payments=page.items,
+        page=page,
+        payment_count=payment_count,
         pending_payments=pending_payments,
         today_revenue=today_revenue,
         recent_payments=recent_payments,
@@ -442,6 +476,22 @@ def payments():
 
 
 
+def _mark_order_completed(order_id, now):
+    """Chuyển đơn sang completed nếu chưa completed; True nếu request này là request đổi trạng thái"""
+    result = db.session.execute(
+        update(Order)
+        .where(Order.order_id == order_id, Order.status.is_distinct_from('completed'))
+        .values(
+            status='completed',
+            completed_time=now,
+            version=func.coalesce(Order.version, 0) + 1,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
 @bp.route('/payment/<int:payment_id>/confirm', methods=['POST'])
 @login_required
 @employee_required
@@ -451,18 +501,34 @@ def confirm_payment(payment_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     payment = Payment.query.get_or_404(payment_id)
-    payment.payment_status = 'completed'
-    payment.payment_time = datetime.utcnow()
-    
-    # Cập nhật order
-    payment.order.status = 'completed'
-    payment.order.completed_time = datetime.utcnow()
-    
-    # Giải phóng bàn nếu là dine-in
-    if payment.order.order_type == 'dine-in' and payment.order.table:
-        payment.order.table.status = 'available'
-    
-    db.session.commit()
+
+    def confirm():
+        now = datetime.utcnow()
+        # Đổi trạng thái có điều kiện: khi 2 request xác nhận cùng lúc chỉ 1 request cập nhật được
+        # (rowcount = 1) và cộng vào bảng tổng hợp; thời điểm thanh toán/hoàn thành cũ được giữ nguyên
+        paid = db.session.execute(
+            update(Payment)
+            .where(Payment.payment_id == payment_id, Payment.payment_status.is_distinct_from('completed'))
+            .values(payment_status='completed', payment_time=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        completed = _mark_order_completed(payment.order_id, now)
+
+        # Giải phóng bàn nếu là dine-in
+        if payment.order.order_type == 'dine-in' and payment.order.table:
+            payment.order.table.status = 'available'
+
+        # Cập nhật bảng tổng hợp doanh thu (cùng transaction)
+        if paid:
+            db.session.refresh(payment)
+            record_payment(payment)
+        if completed:
+            db.session.refresh(payment.order)
+            record_completed_order(payment.order)
+
+    run_in_write_transaction(confirm)
+
+    publish_order_event(payment.order, payment_status=payment.payment_status)
     
     flash('Đã xác nhận thanh toán.', 'success')
     return redirect(url_for('employee.payments'))
@@ -578,10 +644,20 @@ def deliveries():
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    deliveries = query.order_by(Order.order_time.desc()).all()
+    page = keyset_paginate(query, Order.order_time, Order.order_id)
+    if wants_json():
+        return page_json(page)
+
+    status_counts = dict(
+        db.session.query(Order.status, func.count(Order.order_id))
+        .filter(Order.order_type == 'delivery')
+        .group_by(Order.status).all()
+    )
     
     return render_template('employee/deliveries.html',
-                         deliveries=deliveries,
+                         deliveries=page.items,
+                         page=page,
+                         status_counts=status_counts,
                          status_filter=status_filter)
 
 
@@ -606,6 +682,8 @@ def start_delivery(order_id):
 
     db.session.commit()
 
+    publish_order_event(order, DELIVERY_TOPIC, shipper_id=order.shipper_id)
+
     flash('Đã nhận đơn giao hàng.', 'success')
     return redirect(url_for('employee.deliveries'))
 
@@ -625,10 +703,25 @@ def complete_delivery(order_id):
         flash('Bạn không phải shipper đang giao đơn hàng này.', 'warning')
         return redirect(url_for('employee.deliveries'))
 
-    order.status = 'completed'
-    order.completed_time = datetime.utcnow()
+    def complete():
+        if _mark_order_completed(order_id, datetime.utcnow()):
+            db.session.refresh(order)
+            record_completed_order(order)
 
-    db.session.commit()
+    run_in_write_transaction(complete)
+
+    publish_order_event(order, DELIVERY_TOPIC)
 
     flash('Đã hoàn thành giao hàng.', 'success')
     return redirect(url_for('employee.deliveries'))
+
+
+@bp.route('/api/deliveries/events')
+@login_required
+@employee_required
+def delivery_events():
+    """Luồng SSE thay đổi đơn giao hàng"""
+    if current_user.employee_type != 'delivery':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return event_stream_response([DELIVERY_TOPIC])
@@ -0,0 +1,121 @@
+"""
+Benchmark đọc/ghi đồng thời trên SQLite
+Trong lúc các luồng ghi liên tục đặt món, các luồng đọc mở dashboard thu ngân và bếp.
+So sánh thông lượng và độ trễ đọc giữa các chế độ journal (mặc định: DELETE và WAL).
+
+    python scripts/bench_sqlite_concurrency.py --seconds 10 --readers 8 --writers 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+READ_PAGES = [
+    ('cashier@restaurant.vn', 'cashier123', '/employee/dashboard'),
+    ('chef@restaurant.vn', 'chef123', '/employee/kitchen'),
+]
+
+
+def run_mode(args):
+    """Chạy benchmark cho 1 chế độ journal (trong process riêng), in kết quả JSON"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['SQLITE_JOURNAL_MODE'] = args.mode
+
+    from app import create_app
+    from models import db, Inventory
+    from services.schema import init_database
+
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        init_database(seed=True)
+        # Đủ nguyên liệu để không đơn nào bị từ chối
+        Inventory.query.update({Inventory.quantity: 1e9})
+        db.session.commit()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    read_latencies = []
+    writes = [0]
+
+    def logged_in_client(email, password):
+        client = app.test_client()
+        client.post('/auth/login', data={'email': email, 'password': password})
+        return client
+
+    def reader(index):
+        email, password, url = READ_PAGES[index % len(READ_PAGES)]
+        client = logged_in_client(email, password)
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get(url)
+            elapsed = time.perf_counter() - started
+            with lock:
+                read_latencies.append(elapsed)
+
+    def writer():
+        client = logged_in_client('customer@restaurant.vn', 'customer123')
+        while not stop.is_set():
+            client.post('/customer/order/new', data={
+                'order_type': 'takeaway',
+                'cart_items[]': ['4:1', '1:2', '6:1'],
+            })
+            with lock:
+                writes[0] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    read_latencies.sort()
+    count = len(read_latencies)
+    print(json.dumps({
+        'mode': args.mode,
+        'reads_per_sec': count / args.seconds,
+        'writes_per_sec': writes[0] / args.seconds,
+        'read_p50_ms': read_latencies[count // 2] * 1000 if count else None,
+        'read_p95_ms': read_latencies[int(count * 0.95)] * 1000 if count else None,
+        'read_max_ms': read_latencies[-1] * 1000 if count else None,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--modes', default='DELETE,WAL', help='Các chế độ journal cần so sánh')
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    print(f"{'mode':<8} {'reads/s':>9} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for mode in args.modes.split(','):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--mode', mode,
+             '--seconds', str(args.seconds), '--readers', str(args.readers), '--writers', str(args.writers)],
+            capture_output=True, text=True, cwd=ROOT_DIR, check=True
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{r['mode']:<8} {r['reads_per_sec']:>9.1f} {r['writes_per_sec']:>9.1f} "
+              f"{r['read_p50_ms']:>8.1f} {r['read_p95_ms']:>8.1f} {r['read_max_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark khởi động app
+Mỗi lần đo chạy 1 process Python mới (như worker gunicorn vừa được tạo lại), đo thời gian import app,
+create_app() và request đầu tiên. So sánh khởi động có/không tạo bảng + dữ liệu mẫu mỗi lần (AUTO_INIT_DB).
+
+    python scripts/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Thư viện nặng chỉ nên được import khi thực sự dùng
+HEAVY_MODULES = ('openai', 'httpx', 'PIL')
+
+
+def run_child(args):
+    """1 lần khởi động lạnh, in kết quả JSON"""
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+
+    app = create_app()
+    created = time.perf_counter()
+
+    client = app.test_client()
+    response = client.get(args.path)
+    first_request = time.perf_counter()
+
+    print(json.dumps({
+        'status': response.status_code,
+        'import_ms': (imported - started) * 1000,
+        'create_app_ms': (created - imported) * 1000,
+        'first_request_ms': (first_request - created) * 1000,
+        'total_ms': (first_request - started) * 1000,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def prepare_database():
+    """Tạo sẵn database + dữ liệu mẫu (như `flask init-db` và `flask seed` lúc triển khai)"""
+    from app import create_app
+    from services.schema import init_database
+
+    app = create_app()
+    with app.app_context():
+        init_database(seed=True)
+
+
+def run_series(args, auto_init):
+    env = dict(os.environ, AUTO_INIT_DB='true' if auto_init else 'false', JOB_WORKER_ENABLED='false')
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', '--path', args.path],
+            capture_output=True, text=True, cwd=ROOT_DIR, env=env, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/auth/login', help='URL của request đầu tiên')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--prepare', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+    if args.prepare:
+        prepare_database()
+        return
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--prepare'],
+        capture_output=True, cwd=ROOT_DIR, check=True
+    )
+
+    print(f"{'AUTO_INIT_DB':<13} {'phase':<17} {'p50 ms':>8} {'p95 ms':>8}")
+    for auto_init in (True, False):
+        results = run_series(args, auto_init)
+        for phase in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+            values = [r[phase] for r in results]
+            print(f"{str(auto_init).lower():<13} {phase[:-3]:<17} "
+                  f"{percentile(values, 0.5):>8.1f} {percentile(values, 0.95):>8.1f}")
+        heavy = sorted({name for r in results for name in r['heavy_modules']})
+        print(f"{'':<13} {'heavy modules':<17} {', '.join(heavy) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Fake model server
+Giả lập endpoint /v1/chat/completions tương thích OpenAI để chạy thử job kiểm tra AI và chatbot
+mà không gọi API thật: trả lời sau độ trễ cấu hình được, có thể trả lỗi 500/429 ngẫu nhiên để thử backoff.
+
+    python scripts/fake_model_server.py --port 8765 --latency 2 --error-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake flask --app app run
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INSPECTION_RESULTS = [
+    {"status": "safe", "issues": [], "confidence": 0.92, "recommendation": "Có thể sử dụng"},
+    {"status": "warning", "issues": ["Màu sắc hơi sẫm"], "confidence": 0.61, "recommendation": "Kiểm tra lại trước khi chế biến"},
+    {"status": "unsafe", "issues": ["Có dấu hiệu nấm mốc"], "confidence": 0.87, "recommendation": "Loại bỏ nguyên liệu"},
+]
+
+
+def _reply_text(body):
+    """Ảnh nguyên liệu -> JSON kết quả kiểm tra; câu hỏi thường -> câu trả lời mẫu"""
+    content = body.get('messages', [{}])[-1].get('content')
+    if isinstance(content, list):
+        return json.dumps(random.choice(INSPECTION_RESULTS), ensure_ascii=False)
+    return f'Xin chào! Đây là câu trả lời mẫu cho: {content}'
+
+
+def make_handler(args):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            time.sleep(args.latency)
+
+            if random.random() < args.error_rate:
+                status = random.choice((429, 500, 503))
+                return self._json(status, {'error': {'message': 'fake upstream error', 'type': 'server_error'}})
+
+            text = _reply_text(body)
+            if body.get('stream'):
+                return self._stream(body, text)
+
+            self._json(200, {
+                'id': f'chatcmpl-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'fake'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': text},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            })
+
+        def _json(self, status, data):
+            payload = json.dumps(data, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, body, text):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+            for i, word in enumerate(text.split(' ')):
+                chunk = {
+                    'id': completion_id,
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': body.get('model', 'fake'),
+                    'choices': [{'index': 0, 'delta': {'content': word if i == 0 else ' ' + word}, 'finish_reason': None}],
+                }
+                self._chunk(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n')
+                time.sleep(args.token_delay)
+            self._chunk('data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+
+        def _chunk(self, text):
+            data = text.encode()
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+            self.wfile.flush()
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=1.0, help='Số giây chờ trước khi trả lời')
+    parser.add_argument('--token-delay', type=float, default=0.05, help='Số giây giữa các token khi stream')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Tỉ lệ trả lỗi 429/5xx (0-1)')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f'Fake model server: http://{args.host}:{args.port}/v1')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
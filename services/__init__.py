@@ -0,0 +1,4 @@
+"""
+Services Package
+Chứa các logic nghiệp vụ dùng chung giữa các blueprint
+"""
@@ -0,0 +1,139 @@
+"""
+AI Client
+Client OpenAI dùng chung trong process (giữ kết nối keep-alive, timeout cấu hình được)
+và các lời gọi model của hệ thống như kiểm tra VSATTP nguyên liệu qua hình ảnh
+"""
+import json
+import threading
+import time
+from flask import current_app
+
+INSPECTION_PROMPT = """
+Bạn là hệ thống AI kiểm tra an toàn vệ sinh thực phẩm.
+
+NHIỆM VỤ:
+Phân tích hình ảnh nguyên liệu thực phẩm.
+
+QUY TẮC BẮT BUỘC:
+- CHỈ trả về JSON thuần
+- KHÔNG markdown
+- KHÔNG ```json
+- KHÔNG giải thích
+- KHÔNG thêm text bên ngoài
+
+FORMAT CHÍNH XÁC (bắt buộc):
+{
+"status": "safe" | "warning" | "unsafe",
+"issues": ["mô tả ngắn gọn"],
+"confidence": 0.0,
+"recommendation": "khuyến nghị"
+}
+
+Nếu không chắc chắn → status = "warning"
+"""
+
+
+class TransientAIError(Exception):
+    """Lỗi tạm thời khi gọi model (mất kết nối, timeout, 429, 5xx): có thể thử lại"""
+
+
+class AIResponseError(Exception):
+    """Model trả về nội dung không dùng được"""
+
+
+_lock = threading.Lock()
+
+
+def get_ai_client():
+    """Client OpenAI của app, tạo 1 lần; tự thử lại được tắt để caller quyết định backoff"""
+    client = current_app.extensions.get('openai_client')
+    if client is not None:
+        return client
+
+    with _lock:
+        client = current_app.extensions.get('openai_client')
+        if client is None:
+            import httpx
+            from openai import OpenAI
+
+            config = current_app.config
+            timeout = httpx.Timeout(config['OPENAI_TIMEOUT_SECONDS'], connect=config['OPENAI_CONNECT_TIMEOUT_SECONDS'])
+            client = OpenAI(
+                api_key=config['OPENAI_API_KEY'],
+                base_url=config['OPENAI_BASE_URL'],
+                timeout=timeout,
+                max_retries=0,
+                http_client=httpx.Client(
+                    timeout=timeout,
+                    limits=httpx.Limits(
+                        max_connections=config['OPENAI_MAX_CONNECTIONS'],
+                        max_keepalive_connections=config['OPENAI_MAX_CONNECTIONS'],
+                    ),
+                ),
+            )
+            current_app.extensions['openai_client'] = client
+        return client
+
+
+def create_completion(**kwargs):
+    """chat.completions.create trên client dùng chung; lỗi tạm thời được đổi thành TransientAIError"""
+    import openai
+
+    kwargs.setdefault('model', current_app.config['OPENAI_MODEL'])
+    try:
+        return get_ai_client().chat.completions.create(**kwargs)
+    except (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) as e:
+        raise TransientAIError(str(e)) from e
+
+
+def stream_completion(max_seconds=None, **kwargs):
+    """Sinh từng đoạn text của câu trả lời (stream=True).
+
+    Timeout đọc của client giới hạn thời gian chờ giữa 2 đoạn, max_seconds giới hạn cả câu trả lời.
+    Kết nối upstream luôn được đóng khi xong, lỗi, quá hạn hoặc caller dừng đọc (client ngắt kết nối).
+    """
+    import httpx
+    import openai
+
+    kwargs.setdefault('model', current_app.config['OPENAI_MODEL'])
+    try:
+        stream = get_ai_client().chat.completions.create(stream=True, **kwargs)
+    except (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) as e:
+        raise TransientAIError(str(e)) from e
+
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if deadline is not None and time.monotonic() > deadline:
+                raise TransientAIError('Model trả lời quá thời gian cho phép')
+    except (openai.APIError, httpx.TransportError) as e:
+        raise TransientAIError(str(e)) from e
+    finally:
+        stream.response.close()
+
+
+def inspect_ingredient_image(image_url):
+    """Kết quả kiểm tra VSATTP của ảnh nguyên liệu: dict status/issues/confidence/recommendation"""
+    response = create_completion(
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": INSPECTION_PROMPT},
+                    {"type": "image_url", "image_url": {"url": image_url}},
+                ],
+            }
+        ],
+        temperature=0.2,
+        max_tokens=300,
+    )
+
+    try:
+        data = json.loads(response.choices[0].message.content)
+    except (TypeError, ValueError) as e:
+        raise AIResponseError('AI phân tích thất bại (JSON không hợp lệ)') from e
+    if not isinstance(data, dict):
+        raise AIResponseError('AI phân tích thất bại (JSON không hợp lệ)')
+    return data
@@ -0,0 +1,101 @@
+"""
+Static Assets
+Lưu file upload theo hash nội dung (file trùng chỉ lưu 1 lần), URL có fingerprint cho file tĩnh
+và header Cache-Control immutable cho các URL đó: nội dung đổi thì URL đổi nên trình duyệt cache được lâu
+"""
+import hashlib
+import os
+import re
+import threading
+from flask import current_app, request, url_for
+
+HASH_LENGTH = 16
+
+# Tên file theo hash nội dung (và các bản ảnh sinh ra từ nó: <hash>-card.webp)
+HASHED_NAME = re.compile(rf'^[0-9a-f]{{{HASH_LENGTH}}}(-[a-z]+)?\.[a-z0-9]+$')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(stream):
+    """HASH_LENGTH ký tự đầu của sha256 nội dung stream (đọc từng đoạn, không nạp cả file)"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def is_hashed_name(filename):
+    return bool(HASHED_NAME.match(os.path.basename(filename)))
+
+
+def save_upload(file, folder):
+    """Lưu FileStorage vào folder với tên <hash>.<đuôi>, bỏ qua nếu đã có file cùng nội dung; trả về tên file"""
+    file.stream.seek(0)
+    digest = content_hash(file.stream)
+    file.stream.seek(0)
+
+    ext = re.sub(r'[^a-z0-9]', '', os.path.splitext(file.filename or '')[1].lower()) or 'bin'
+    filename = f'{digest}.{ext}'
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        # Ghi ra file tạm rồi đổi tên: request khác không bao giờ thấy file ghi dở
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        file.save(tmp_path)
+        os.replace(tmp_path, path)
+    return filename
+
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(path):
+    """Hash nội dung file, tính lại chỉ khi mtime/kích thước đổi; None nếu không có file"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    with open(path, 'rb') as f:
+        fingerprint = content_hash(f)
+    with _fingerprints_lock:
+        _fingerprints[path] = (key, fingerprint)
+    return fingerprint
+
+
+def asset_url(filename):
+    """url_for('static') kèm ?v=<hash nội dung>; file đã đặt tên theo hash thì giữ nguyên URL"""
+    if is_hashed_name(filename):
+        return url_for('static', filename=filename)
+    fingerprint = file_fingerprint(os.path.join(current_app.static_folder, filename))
+    if fingerprint is None:
+        return url_for('static', filename=filename)
+    return url_for('static', filename=filename, v=fingerprint)
+
+
+def _cache_static_response(response):
+    """URL có fingerprint (tên hash hoặc ?v=) được cache 1 năm, không cần hỏi lại server"""
+    if request.endpoint != 'static' or response.status_code not in (200, 304):
+        return response
+
+    filename = (request.view_args or {}).get('filename', '')
+    if request.args.get('v') or is_hashed_name(filename):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+def register_asset_helpers(app):
+    app.add_template_global(asset_url)
+    app.after_request(_cache_static_response)
@@ -0,0 +1,189 @@
+"""
+Table Availability
+Tính bàn trống cho đặt bàn: mỗi bàn giữ danh sách giờ bắt đầu đặt bàn đã sắp xếp,
+kiểm tra trùng lịch bằng bisect (log n) và quét cả ngày theo slot trong 1 lượt
+"""
+import bisect
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from models import db, Table, Reservation
+from services.versions import get_version, bump_version
+
+# Phiên bản tăng sau mỗi commit thay đổi đặt bàn hoặc bàn (dùng làm ETag cho lưới bàn trống)
+AVAILABILITY_VERSION = 'availability'
+
+# Trạng thái đặt bàn đang giữ bàn
+ACTIVE_RESERVATION_STATUSES = ('pending', 'confirmed')
+
+# Mỗi lượt đặt bàn giữ bàn trong khoảng [giờ đặt, giờ đặt + thời lượng)
+RESERVATION_DURATION = timedelta(hours=2)
+
+
+class TableAvailability:
+    """Lịch đặt bàn của các bàn trong 1 khoảng thời gian (không truy vấn thêm sau khi tạo)"""
+
+    def __init__(self, tables, reservations, duration=RESERVATION_DURATION):
+        self.duration = duration
+        self.tables = sorted(tables, key=lambda t: (t.capacity, t.table_number))
+        self._starts = {t.table_id: [] for t in self.tables}
+        for table_id, start in reservations:
+            if table_id in self._starts:
+                self._starts[table_id].append(start)
+        for starts in self._starts.values():
+            starts.sort()
+
+    def is_free(self, table_id, when):
+        """Không có lượt đặt nào giao với [when, when + duration)"""
+        starts = self._starts.get(table_id, ())
+        # Lượt đặt giao nhau khi when - duration < start < when + duration
+        i = bisect.bisect_right(starts, when - self.duration)
+        return i == len(starts) or starts[i] >= when + self.duration
+
+    def free_tables(self, when, guests=None):
+        """Các bàn trống tại thời điểm `when` đủ chỗ cho `guests` khách (bàn nhỏ trước)"""
+        return [
+            t for t in self.tables
+            if (guests is None or t.capacity >= guests) and self.is_free(t.table_id, when)
+        ]
+
+    def free_slots(self, slots, guests=None):
+        """{table_id: [bool theo từng slot]} cho danh sách slot đã sắp xếp, quét 1 lượt mỗi bàn"""
+        grid = {}
+        for table in self.tables:
+            if guests is not None and table.capacity < guests:
+                grid[table.table_id] = [False] * len(slots)
+                continue
+
+            starts = self._starts[table.table_id]
+            row = []
+            i = 0
+            for slot in slots:
+                # Bỏ các lượt đặt đã kết thúc trước slot (slot tăng dần nên chỉ tiến con trỏ)
+                while i < len(starts) and starts[i] <= slot - self.duration:
+                    i += 1
+                row.append(i == len(starts) or starts[i] >= slot + self.duration)
+            grid[table.table_id] = row
+        return grid
+
+
+def load_availability(start, end, table_id=None):
+    """Tải bàn và các lượt đặt có thể giao với [start, end) trong 2 query.
+
+    Danh sách/lưới (không có table_id) chỉ gồm bàn đang mở; kiểm tra 1 bàn thì tải bàn đó
+    bất kể trạng thái hiện tại, vì bàn 'reserved' vẫn có các lượt đặt cần chặn trùng lịch.
+    """
+    tables = Table.query
+    reservations = db.session.query(Reservation.table_id, Reservation.reservation_time).filter(
+        Reservation.status.in_(ACTIVE_RESERVATION_STATUSES),
+        Reservation.reservation_time > start - RESERVATION_DURATION,
+        Reservation.reservation_time < end + RESERVATION_DURATION
+    )
+    if table_id is not None:
+        tables = tables.filter(Table.table_id == table_id)
+        reservations = reservations.filter(Reservation.table_id == table_id)
+    else:
+        tables = tables.filter(Table.status == 'available')
+
+    return TableAvailability(tables.all(), reservations.all())
+
+
+def free_tables_at(when, guests=None):
+    """Bàn trống cho lượt đặt bắt đầu lúc `when`"""
+    return load_availability(when, when).free_tables(when, guests)
+
+
+def table_is_free(table_id, when):
+    return load_availability(when, when, table_id=table_id).is_free(table_id, when)
+
+
+def day_slots(day):
+    """Các slot bắt đầu đặt bàn trong giờ mở cửa của ngày `day` (cách nhau RESERVATION_SLOT_MINUTES)"""
+    config = current_app.config
+    opening = datetime.combine(day, datetime.strptime(config['RESERVATION_OPENING_TIME'], '%H:%M').time())
+    closing = datetime.combine(day, datetime.strptime(config['RESERVATION_CLOSING_TIME'], '%H:%M').time())
+    step = timedelta(minutes=config['RESERVATION_SLOT_MINUTES'])
+
+    slots = []
+    slot = opening
+    while slot < closing:
+        slots.append(slot)
+        slot += step
+    return slots
+
+
+def availability_grid(day, guests=None, now=None):
+    """Lưới bàn trống cả ngày: 1 lượt quét các lượt đặt của ngày đó.
+
+    Slot đã qua (<= now) luôn là không đặt được.
+    """
+    slots = day_slots(day)
+    if not slots:
+        return slots, []
+
+    availability = load_availability(slots[0], slots[-1])
+    grid = availability.free_slots(slots, guests)
+
+    if now is not None:
+        past = bisect.bisect_right(slots, now)
+        for row in grid.values():
+            row[:past] = [False] * min(past, len(row))
+
+    return slots, [(table, grid[table.table_id]) for table in availability.tables]
+
+
+def availability_version():
+    return get_version(AVAILABILITY_VERSION)
+
+
+def availability_fingerprint(day):
+    """Dấu của dữ liệu lưới bàn trống ngày `day` đọc thẳng từ database (2 query tổng hợp).
+
+    Dùng kèm availability_version() trong ETag: version có thể chưa đổi ở worker khác
+    (backend local), dấu này đổi ngay khi có lượt đặt/hủy hoặc bàn thay đổi.
+    """
+    slots = day_slots(day)
+    if not slots:
+        return '0'
+
+    reservations = db.session.query(
+        func.count(Reservation.reservation_id),
+        func.max(Reservation.reservation_id),
+        func.sum(Reservation.reservation_id),
+    ).filter(
+        Reservation.status.in_(ACTIVE_RESERVATION_STATUSES),
+        Reservation.reservation_time > slots[0] - RESERVATION_DURATION,
+        Reservation.reservation_time < slots[-1] + RESERVATION_DURATION
+    ).one()
+    tables = db.session.query(
+        func.count(Table.table_id),
+        func.sum(Table.table_id * Table.capacity),
+        func.sum(Table.capacity),
+    ).filter(Table.status == 'available').one()
+
+    return '.'.join(str(value or 0) for value in (*reservations, *tables))
+
+
+def _track_availability_changes(session, flush_context):
+    if any(isinstance(obj, (Reservation, Table))
+           for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info['availability_changed'] = True
+
+
+def _bump_after_commit(session):
+    if session.info.pop('availability_changed', False):
+        bump_version(AVAILABILITY_VERSION)
+
+
+def _clear_after_rollback(session):
+    session.info.pop('availability_changed', None)
+
+
+def register_availability_versioning():
+    """Tự tăng phiên bản khi commit thay đổi Reservation/Table (gọi một lần khi khởi tạo app)"""
+    for name, listener in (('after_flush', _track_availability_changes),
+                           ('after_commit', _bump_after_commit),
+                           ('after_rollback', _clear_after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
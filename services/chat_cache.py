@@ -0,0 +1,174 @@
+"""
+Chatbot Response Cache
+Cache câu trả lời của model theo phiên bản menu và câu hỏi đã chuẩn hóa (chữ thường NFC, bỏ dấu câu), có TTL và loại bỏ LRU.
+Backend local (trong process) hoặc sqlite (file dùng chung giữa các worker).
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from services.chat_intents import normalize_message
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def cache_key(question, catalog_version):
+    """Khóa theo phiên bản menu và câu hỏi chữ thường NFC, bỏ dấu câu/khoảng trắng thừa.
+
+    Giữ dấu tiếng Việt ('bàn' và 'bán' là 2 câu hỏi khác nhau); menu đổi thì câu trả lời cũ không còn dùng
+    """
+    return f"{catalog_version}:{' '.join(_WORD_RE.findall(normalize_message(question)))}"
+
+
+class CacheStats:
+    """Số lần hit/miss/evict trong process hiện tại"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def evicted(self, n=1):
+        with self._lock:
+            self.evictions += n
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+        }
+
+
+class LocalResponseCache:
+    """OrderedDict theo thứ tự dùng gần nhất: đầu danh sách là mục bị loại khi đầy"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (hết hạn lúc, giá trị)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self.stats.count(entry is not None)
+        return entry[1] if entry is not None else None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.stats.evicted(evicted)
+
+    def size(self):
+        return len(self._entries)
+
+
+class SqliteResponseCache:
+    """Bảng responses trong 1 file SQLite riêng; cột last_used dùng để loại LRU"""
+
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT value FROM responses WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+        self.stats.count(row is not None)
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, '
+                'expires_at = excluded.expires_at, last_used = excluded.last_used',
+                (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now)
+            )
+            # Xóa mục hết hạn trước, sau đó các mục lâu không dùng nhất nếu vẫn vượt giới hạn
+            conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+            excess = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    'DELETE FROM responses WHERE key IN '
+                    '(SELECT key FROM responses ORDER BY last_used LIMIT ?)', (excess,)
+                )
+                self.stats.evicted(excess)
+
+    def size(self):
+        return self._connect().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+BACKENDS = {
+    'local': lambda app, ttl, size: LocalResponseCache(ttl, size),
+    'sqlite': lambda app, ttl, size: SqliteResponseCache(
+        os.path.join(app.config['CACHE_VERSION_PATH'], 'chatbot_cache.db'), ttl, size
+    ),
+}
+
+
+def init_response_cache(app):
+    """Tạo cache câu trả lời chatbot theo CHATBOT_CACHE_BACKEND (local, sqlite)"""
+    backend = app.config['CHATBOT_CACHE_BACKEND']
+    if backend not in BACKENDS:
+        raise ValueError(f'CHATBOT_CACHE_BACKEND không hợp lệ: {backend}')
+    app.extensions['chatbot_cache'] = BACKENDS[backend](
+        app, app.config['CHATBOT_CACHE_TTL_SECONDS'], app.config['CHATBOT_CACHE_MAX_ENTRIES']
+    )
+
+
+def get_response_cache():
+    return current_app.extensions['chatbot_cache']
+
+
+def cache_metrics():
+    cache = get_response_cache()
+    return dict(cache.stats.as_dict(), size=cache.size())
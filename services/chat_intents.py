@@ -0,0 +1,96 @@
+"""
+Chatbot Intents
+Bộ định tuyến ý định cho chatbot: toàn bộ từ khóa được biên dịch 1 lần thành automaton Aho-Corasick,
+mỗi câu hỏi chỉ quét 1 lượt để biết các ý định khớp (thay cho chuỗi if any(k in msg ...))
+"""
+import threading
+import unicodedata
+from collections import deque
+
+
+class KeywordAutomaton:
+    """Automaton Aho-Corasick: tìm mọi từ khóa xuất hiện trong chuỗi với 1 lần quét"""
+
+    def __init__(self, keywords):
+        """keywords: {từ khóa: tập giá trị trả về khi khớp}"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+
+        for keyword, values in keywords.items():
+            state = 0
+            for ch in keyword:
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            self._output[state] |= set(values)
+
+        # Liên kết thất bại theo BFS: trạng thái có hậu tố dài nhất cũng là tiền tố trong trie
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, child in self._goto[state].items():
+                pending.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._output[child] |= self._output[self._fail[child]]
+
+    def find(self, text):
+        """Tập giá trị của mọi từ khóa có trong text"""
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            found |= self._output[state]
+        return found
+
+
+def normalize_message(text):
+    """Chữ thường dạng NFC để từ khóa có dấu khớp bất kể bộ gõ (tổ hợp hay dựng sẵn)"""
+    return unicodedata.normalize('NFC', (text or '').lower())
+
+
+class IntentRouter:
+    """Ý định theo thứ tự ưu tiên, mỗi ý định là 1 danh sách từ khóa; đếm số lần khớp từng ý định"""
+
+    FALLBACK = 'fallback'
+
+    def __init__(self, intents):
+        """intents: [(tên ý định, [từ khóa])] theo thứ tự ưu tiên"""
+        self.order = [name for name, _ in intents]
+        keywords = {}
+        for name, words in intents:
+            for word in words:
+                keywords.setdefault(normalize_message(word), set()).add(name)
+        self._automaton = KeywordAutomaton(keywords)
+
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def match(self, message):
+        """Các ý định khớp câu hỏi, theo thứ tự ưu tiên"""
+        found = self._automaton.find(normalize_message(message))
+        return [name for name in self.order if name in found]
+
+    def record(self, intent):
+        """Ghi nhận ý định đã trả lời câu hỏi (FALLBACK nếu phải gọi model)"""
+        with self._lock:
+            self._counts[intent] = self._counts.get(intent, 0) + 1
+
+    def metrics(self):
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        fallback = counts.get(self.FALLBACK, 0)
+        return {
+            'requests': total,
+            'intents': counts,
+            'routed_rate': round((total - fallback) / total, 4) if total else None,
+        }
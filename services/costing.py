@@ -0,0 +1,37 @@
+"""
+Costing
+Tính giá vốn nguyên liệu cho món ăn và chốt giá vốn lên OrderItem
+"""
+from sqlalchemy import func, update
+from models import db, OrderItem, MenuIngredient, Inventory
+
+
+def menu_unit_costs():
+    """Giá vốn 1 phần của từng món theo giá nhập hiện tại: {menu_id: cost}"""
+    return dict(
+        db.session.query(
+            MenuIngredient.menu_id,
+            func.sum(MenuIngredient.quantity_needed * func.coalesce(Inventory.unit_cost, 0))
+        ).join(Inventory, MenuIngredient.inventory_id == Inventory.item_id
+        ).group_by(MenuIngredient.menu_id).all()
+    )
+
+
+def backfill_item_costs():
+    """Chốt giá vốn cho các OrderItem cũ chưa có snapshot. Trả về số dòng đã cập nhật"""
+    unit_costs = menu_unit_costs()
+
+    updated = 0
+    for menu_id, in db.session.query(OrderItem.menu_id).filter(
+        OrderItem.unit_cost_snapshot.is_(None)
+    ).distinct().all():
+        unit_cost = unit_costs.get(menu_id, 0)
+        result = db.session.execute(
+            update(OrderItem)
+            .where(OrderItem.menu_id == menu_id, OrderItem.unit_cost_snapshot.is_(None))
+            .values(unit_cost_snapshot=unit_cost, line_cost=OrderItem.quantity * unit_cost)
+        )
+        updated += result.rowcount
+
+    db.session.commit()
+    return updated
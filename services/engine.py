@@ -0,0 +1,82 @@
+"""
+Database Engine
+Cấu hình engine SQLAlchemy và transaction ghi có retry
+"""
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, DBAPIError
+from models import db
+
+# Mã lỗi PostgreSQL có thể thử lại: serialization_failure, deadlock_detected
+RETRYABLE_PG_CODES = {'40001', '40P01'}
+
+
+def configure_engine(app):
+    """Gắn các event hook vào engine (gọi sau db.init_app, trong app context)"""
+    engine = db.engine
+
+    if engine.dialect.name == 'sqlite':
+        # Tắt cơ chế BEGIN ngầm của pysqlite để tự phát lệnh BEGIN,
+        # cho phép transaction ghi dùng BEGIN IMMEDIATE (giữ write lock ngay từ đầu)
+        pragmas = [
+            ('journal_mode', app.config['SQLITE_JOURNAL_MODE']),
+            ('synchronous', app.config['SQLITE_SYNCHRONOUS']),
+            ('busy_timeout', app.config['SQLITE_BUSY_TIMEOUT_MS']),
+            ('cache_size', -app.config['SQLITE_CACHE_SIZE_KB']),  # Số âm: tính theo KiB
+            ('temp_store', app.config['SQLITE_TEMP_STORE']),
+            ('mmap_size', app.config['SQLITE_MMAP_SIZE']),
+        ]
+
+        @event.listens_for(engine, 'connect')
+        def sqlite_on_connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas:
+                if value is not None and value != '':
+                    cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
+
+        @event.listens_for(engine, 'begin')
+        def sqlite_begin(conn):
+            mode = conn.get_execution_options().get('sqlite_begin', 'DEFERRED')
+            conn.exec_driver_sql(f'BEGIN {mode}')
+
+
+def begin_write_transaction():
+    """Kết thúc transaction hiện tại và mở transaction ghi mới.
+
+    SQLite: BEGIN IMMEDIATE (các request ghi khác phải chờ, không bị lỗi giữa chừng).
+    PostgreSQL: transaction thường, khóa dòng bằng SELECT ... FOR UPDATE / UPDATE có điều kiện.
+    """
+    db.session.commit()
+    db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+
+
+def is_retryable_error(error):
+    """Lỗi do tranh chấp khóa, có thể chạy lại transaction"""
+    if isinstance(error, OperationalError) and 'locked' in str(error.orig).lower():
+        return True
+    if isinstance(error, DBAPIError):
+        # psycopg (v3) dùng sqlstate, psycopg2 dùng pgcode
+        code = getattr(error.orig, 'sqlstate', None) or getattr(error.orig, 'pgcode', None)
+        return code in RETRYABLE_PG_CODES
+    return False
+
+
+def run_in_write_transaction(func, attempts=5, backoff=0.05):
+    """Chạy func() trong transaction ghi rồi commit; thử lại khi bị tranh chấp khóa"""
+    for attempt in range(1, attempts + 1):
+        begin_write_transaction()
+        try:
+            result = func()
+            db.session.commit()
+            return result
+        except DBAPIError as e:
+            db.session.rollback()
+            if attempt == attempts or not is_retryable_error(e):
+                raise
+            time.sleep(backoff * 2 ** (attempt - 1))
+        except Exception:
+            db.session.rollback()
+            raise
@@ -0,0 +1,104 @@
+"""
+Order Events
+Pub/sub trong process cho trạng thái đơn hàng và luồng Server-Sent Events (SSE)
+gửi thay đổi tới màn hình khách hàng, bếp và giao hàng thay vì tải lại trang định kỳ
+"""
+import json
+import queue
+import threading
+import time
+from flask import Response, current_app, stream_with_context
+from models import db
+
+# Topic dùng chung
+KITCHEN_TOPIC = 'kitchen'
+DELIVERY_TOPIC = 'delivery'
+
+
+def order_topic(order_id):
+    return f'order:{order_id}'
+
+
+class EventBroker:
+    """Phân phối sự kiện tới các subscriber theo topic (mỗi subscriber 1 hàng đợi)"""
+
+    def __init__(self, max_queue_size=100):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # topic -> set(queue)
+        self._max_queue_size = max_queue_size
+
+    def subscribe(self, *topics):
+        q = queue.Queue(maxsize=self._max_queue_size)
+        with self._lock:
+            for topic in topics:
+                self._subscribers.setdefault(topic, set()).add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            for topic in list(self._subscribers):
+                self._subscribers[topic].discard(q)
+                if not self._subscribers[topic]:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(data)
+            except queue.Full:
+                # Client quá chậm: bỏ sự kiện, client sẽ tự đồng bộ lại khi kết nối lại
+                pass
+
+
+broker = EventBroker()
+
+
+def publish_order_event(order, *topics, **extra):
+    """Gửi delta trạng thái đơn hàng tới topic của đơn và các topic bổ sung (gọi sau commit)"""
+    data = {
+        'order_id': order.order_id,
+        'status': order.status,
+        'order_type': order.order_type,
+        **extra,
+    }
+    broker.publish(order_topic(order.order_id), data)
+    for topic in topics:
+        broker.publish(topic, data)
+
+
+def format_sse(data, event=None):
+    """1 sự kiện SSE (data là JSON)"""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def event_stream_response(topics):
+    """Response SSE cho các topic; tự đóng sau SSE_MAX_STREAM_SECONDS (EventSource sẽ tự kết nối lại)"""
+    heartbeat = current_app.config['SSE_HEARTBEAT_SECONDS']
+    max_duration = current_app.config['SSE_MAX_STREAM_SECONDS']
+
+    # Trả kết nối database về pool, luồng SSE không truy vấn database
+    db.session.close()
+
+    def generate():
+        q = broker.subscribe(*topics)
+        deadline = time.monotonic() + max_duration
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    data = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                yield format_sse(data)
+        finally:
+            broker.unsubscribe(q)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
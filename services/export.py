@@ -0,0 +1,164 @@
+"""
+Export
+Xuất đơn hàng, thanh toán và số liệu báo cáo ra CSV/NDJSON dạng stream:
+đọc theo lô bằng yield_per (server-side cursor trên PostgreSQL) và gửi dần từng phần,
+bộ nhớ không tăng theo khoảng ngày và byte đầu tiên được gửi ngay
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from flask import Response, stream_with_context
+from sqlalchemy import select
+from models import db, User, Menu, Table, Order, OrderItem, Payment
+from services.timerange import in_range
+from services.reports import daily_revenue_query, top_dishes_query, order_types_query, top_customers_query
+
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _stream(stmt):
+    """Duyệt kết quả theo lô EXPORT_BATCH_SIZE dòng"""
+    return db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+
+def _tuples(stmt):
+    for row in _stream(stmt):
+        yield tuple(row)
+
+
+def order_item_rows(period):
+    """Mỗi dòng là 1 món của đơn hàng đặt trong khoảng thời gian"""
+    columns = [
+        'order_id', 'order_time', 'completed_time', 'order_status', 'order_type',
+        'customer_name', 'table_number', 'total_amount',
+        'order_item_id', 'menu_name', 'quantity', 'price', 'line_total', 'item_status', 'line_cost',
+    ]
+    stmt = select(
+        Order.order_id, Order.order_time, Order.completed_time, Order.status, Order.order_type,
+        User.name, Table.table_number, Order.total_amount,
+        OrderItem.order_item_id, Menu.name, OrderItem.quantity, OrderItem.price,
+        OrderItem.quantity * OrderItem.price, OrderItem.status, OrderItem.line_cost
+    ).select_from(Order).join(
+        User, Order.customer_id == User.user_id
+    ).outerjoin(
+        Table, Order.table_id == Table.table_id
+    ).join(
+        OrderItem, OrderItem.order_id == Order.order_id
+    ).join(
+        Menu, OrderItem.menu_id == Menu.menu_id
+    ).where(
+        in_range(Order.order_time, period)
+    ).order_by(Order.order_time, Order.order_id, OrderItem.order_item_id)
+
+    return columns, _tuples(stmt)
+
+
+def payment_rows(period):
+    """Thanh toán trong khoảng thời gian, kèm mã khuyến mãi và số tiền giảm"""
+    columns = [
+        'payment_id', 'order_id', 'payment_time', 'payment_method', 'payment_status',
+        'amount', 'promo_code', 'discount_amount', 'final_amount', 'transaction_id',
+    ]
+    stmt = select(
+        Payment.payment_id, Payment.order_id, Payment.payment_time, Payment.payment_method,
+        Payment.payment_status, Payment.amount, Payment.promo_code, Payment.discount_amount,
+        Payment.final_amount, Payment.transaction_id
+    ).where(
+        in_range(Payment.payment_time, period)
+    ).order_by(Payment.payment_time, Payment.payment_id)
+
+    return columns, _tuples(stmt)
+
+
+def report_rows(period):
+    """Các bảng của trang báo cáo nối tiếp nhau, phân biệt bằng cột section"""
+    columns = ['section', 'date', 'name', 'email', 'order_type', 'count', 'quantity', 'revenue']
+
+    def rows():
+        for r in _stream(daily_revenue_query(period).statement):
+            yield ('daily_revenue', r.date, None, None, None, None, None, r.revenue)
+        for r in _stream(top_dishes_query(period, limit=None).statement):
+            yield ('dishes', None, r.name, None, None, None, r.total_sold, r.revenue)
+        for r in _stream(order_types_query(period).statement):
+            yield ('order_types', None, None, None, r.order_type, r.count, None, r.revenue)
+        for r in _stream(top_customers_query(period, limit=None).statement):
+            yield ('customers', None, r.name, r.email, None, r.order_count, None, r.total_spent)
+
+    return columns, rows()
+
+
+EXPORT_DATASETS = {
+    'orders': order_item_rows,
+    'payments': payment_rows,
+    'reports': report_rows,
+}
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def _csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM để Excel nhận đúng UTF-8 (tiếng Việt)
+    writer.writerow(columns)
+    yield '\ufeff' + buffer.getvalue()
+
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(['' if v is None else _value(v) for v in row])
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(columns, rows):
+    for row in rows:
+        yield json.dumps(
+            {column: _value(value) for column, value in zip(columns, row)},
+            ensure_ascii=False
+        ) + '\n'
+
+
+def _batched(chunks, size=EXPORT_BATCH_SIZE):
+    """Gộp các dòng thành từng khối để giảm số lần ghi ra socket.
+
+    Khối đầu tiên (header CSV hoặc dòng đầu) được gửi ngay, không chờ đủ lô.
+    """
+    first = next(chunks, None)
+    if first is None:
+        return
+    yield first
+
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def export_response(dataset, fmt, period, filename):
+    """Response stream cho dataset ('orders', 'payments', 'reports') theo định dạng ('csv', 'ndjson')"""
+    columns, rows = EXPORT_DATASETS[dataset](period)
+    chunks = _csv_chunks(columns, rows) if fmt == 'csv' else _ndjson_chunks(columns, rows)
+
+    return Response(
+        stream_with_context(_batched(chunks)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}.{fmt}"',
+            'X-Accel-Buffering': 'no',
+        }
+    )
@@ -0,0 +1,202 @@
+"""
+Menu Images
+Tạo các bản ảnh món ăn theo kích thước (thumb, card, full) ở dạng WebP và JPEG, bỏ metadata,
+và helper cho template chọn bản phù hợp bằng srcset thay vì tải ảnh gốc vài MB
+"""
+import os
+import shutil
+from flask import current_app
+from services.assets import asset_url, content_hash, is_hashed_name
+
+# Chiều rộng tối đa của từng bản (không phóng to ảnh nhỏ hơn)
+VARIANT_WIDTHS = {'thumb': 160, 'card': 480, 'full': 1200}
+
+# Định dạng -> (phần mở rộng, tham số lưu của Pillow)
+FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 6}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Thư mục con (trong UPLOAD_FOLDER) chứa các bản đã tạo
+VARIANT_DIR = 'variants'
+
+
+def generate_variants(source_path, output_dir):
+    """Tạo các bản ảnh của source_path trong output_dir.
+
+    Trả về {tên bản: {'width', 'height', 'webp', 'jpeg'}} với đường dẫn tương đối so với thư mục cha
+    của output_dir. Không dùng app context để chạy được trong process pool.
+    """
+    from PIL import Image, ImageOps
+
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    prefix = os.path.basename(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with Image.open(source_path) as original:
+        # Xoay theo EXIF trước khi bỏ metadata, chuyển về RGB cho JPEG (PNG/WebP có thể có kênh alpha)
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    image.info = {}
+
+    variants = {}
+    for name, max_width in VARIANT_WIDTHS.items():
+        width = min(max_width, image.width)
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+
+        variant = {'width': width, 'height': height}
+        for fmt, (ext, options) in FORMATS.items():
+            filename = f'{stem}-{name}.{ext}'
+            resized.save(os.path.join(output_dir, filename), **options)
+            variant[fmt] = f'{prefix}/{filename}'
+        variants[name] = variant
+
+    return variants
+
+
+def build_menu_variants(filename):
+    """Tạo các bản cho ảnh món ăn đã lưu trong UPLOAD_FOLDER; None nếu không đọc được ảnh"""
+    from models import Menu
+
+    # Ảnh đặt tên theo hash đã có món khác dùng: các bản đã tạo sẵn, không cần xử lý lại
+    if is_hashed_name(filename):
+        existing = Menu.query.filter(Menu.image_url == filename, Menu.image_variants.isnot(None)).first()
+        if existing is not None:
+            return existing.image_variants
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    try:
+        return generate_variants(os.path.join(upload_folder, filename), os.path.join(upload_folder, VARIANT_DIR))
+    except OSError as e:
+        current_app.logger.warning('Không tạo được ảnh thu nhỏ cho %s: %s', filename, e)
+        return None
+
+
+def remove_menu_variants(variants):
+    """Xóa các file của 1 bộ ảnh (khi món đổi ảnh)"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    for variant in (variants or {}).values():
+        for fmt in FORMATS:
+            path = os.path.join(upload_folder, variant.get(fmt, ''))
+            if variant.get(fmt) and os.path.exists(path):
+                os.remove(path)
+
+
+def release_menu_image(image_url, variants):
+    """Xóa ảnh cũ (và các bản) nếu không còn món nào dùng file đó.
+
+    Gọi sau khi commit đổi ảnh/xóa món thành công: commit lỗi thì món vẫn giữ nguyên ảnh
+    """
+    from models import Menu
+
+    if not image_url or image_url == 'default.jpg':
+        return
+    if Menu.query.filter(Menu.image_url == image_url).count():
+        return
+
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], image_url)
+    if os.path.exists(path):
+        os.remove(path)
+    remove_menu_variants(variants)
+
+
+def hash_menu_images():
+    """Chuyển ảnh món ăn tên cũ (<thời gian>_<tên>) sang tên theo hash nội dung, ảnh trùng gộp về 1 file.
+
+    File cũ được giữ lại (dữ liệu mẫu vẫn tham chiếu), tạo bằng hard link nếu được nên không tốn thêm dung lượng.
+    Các món được chuyển sẽ cần tạo lại bản ảnh. Trả về số món đã chuyển.
+    """
+    from models import db, Menu
+    from services.menu_catalog import invalidate_catalog
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    renamed = {}
+    updated = 0
+    for item in Menu.query.filter(Menu.image_url.isnot(None)).all():
+        if is_hashed_name(item.image_url):
+            continue
+        if item.image_url not in renamed:
+            source = os.path.join(upload_folder, item.image_url)
+            if not os.path.isfile(source):
+                continue
+            with open(source, 'rb') as f:
+                digest = content_hash(f)
+            ext = os.path.splitext(item.image_url)[1].lower().lstrip('.')
+            target = os.path.join(upload_folder, f'{digest}.{ext}')
+            if not os.path.exists(target):
+                try:
+                    os.link(source, target)
+                except OSError:
+                    shutil.copyfile(source, target)
+            renamed[item.image_url] = os.path.basename(target)
+
+        item.image_url = renamed[item.image_url]
+        item.image_variants = None
+        updated += 1
+
+    db.session.commit()
+    invalidate_catalog()
+    return updated
+
+
+def backfill_menu_variants(workers=None, force=False):
+    """Tạo bản ảnh cho các món chưa có (hoặc tất cả nếu force), song song trên nhiều process.
+
+    Trả về (số món đã cập nhật, danh sách file ảnh không tìm thấy)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from models import db, Menu
+    from services.menu_catalog import invalidate_catalog
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    query = Menu.query.filter(Menu.image_url.isnot(None))
+    if not force:
+        query = query.filter(Menu.image_variants.is_(None))
+    items = query.all()
+
+    # Nhiều món có thể dùng chung 1 ảnh (default.jpg): mỗi file chỉ xử lý 1 lần
+    sources = {item.image_url for item in items}
+    missing = sorted(f for f in sources if not os.path.isfile(os.path.join(upload_folder, f)))
+    sources = sorted(sources - set(missing))
+
+    output_dir = os.path.join(upload_folder, VARIANT_DIR)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = dict(zip(sources, pool.map(
+            generate_variants,
+            [os.path.join(upload_folder, f) for f in sources],
+            [output_dir] * len(sources),
+        )))
+
+    updated = 0
+    for item in items:
+        if item.image_url in results:
+            item.image_variants = results[item.image_url]
+            updated += 1
+    db.session.commit()
+    invalidate_catalog()
+    return updated, missing
+
+
+def _static_url(path):
+    return asset_url(f'images/menu/{path}')
+
+
+def menu_image_url(item, variant='card', fmt='jpeg'):
+    """URL 1 bản ảnh của món (Menu, MenuEntry hoặc dòng query có image_url/image_variants); ảnh gốc nếu chưa có bản"""
+    path = ((item.image_variants or {}).get(variant) or {}).get(fmt) or item.image_url
+    return _static_url(path) if path else None
+
+
+def menu_srcset(item, fmt='jpeg'):
+    """Giá trị srcset: các bản theo chiều rộng ("... 160w, ... 480w, ... 1200w")"""
+    candidates = {}
+    for name in VARIANT_WIDTHS:
+        variant = (item.image_variants or {}).get(name)
+        if variant and variant.get(fmt):
+            candidates.setdefault(variant['width'], variant[fmt])
+    return ', '.join(f'{_static_url(path)} {width}w' for width, path in sorted(candidates.items()))
+
+
+def register_image_helpers(app):
+    app.add_template_global(menu_image_url)
+    app.add_template_global(menu_srcset)
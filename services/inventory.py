@@ -0,0 +1,54 @@
+"""
+Inventory Reservation
+Trừ/hoàn nguyên liệu trong kho bằng câu lệnh UPDATE nguyên tử có điều kiện,
+đảm bảo số lượng tồn kho không bao giờ âm khi nhiều đơn đặt cùng lúc
+"""
+from datetime import datetime
+from sqlalchemy import update
+from models import db, Inventory
+
+
+class InsufficientStock(Exception):
+    """Không đủ nguyên liệu cho đơn hàng"""
+
+    def __init__(self, inventory_ids):
+        self.inventory_ids = list(inventory_ids)
+        super().__init__(f'Không đủ nguyên liệu: {self.inventory_ids}')
+
+
+def reserve_stock(needs):
+    """Trừ kho theo {inventory_id: số lượng}.
+
+    Mỗi dòng dùng UPDATE ... SET quantity = quantity - :n WHERE quantity >= :n,
+    dòng nào không được cập nhật (rowcount = 0) là không đủ hàng.
+    Raise InsufficientStock nếu có dòng thiếu; caller phải rollback transaction.
+    """
+    now = datetime.utcnow()
+    short = []
+
+    # Cập nhật theo thứ tự item_id để tránh deadlock giữa các transaction (PostgreSQL)
+    for inventory_id, amount in sorted(needs.items()):
+        result = db.session.execute(
+            update(Inventory)
+            .where(Inventory.item_id == inventory_id, Inventory.quantity >= amount)
+            .values(quantity=Inventory.quantity - amount, last_updated=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            short.append(inventory_id)
+
+    if short:
+        raise InsufficientStock(short)
+
+
+def release_stock(needs):
+    """Hoàn lại nguyên liệu vào kho theo {inventory_id: số lượng} (cộng nguyên tử)"""
+    now = datetime.utcnow()
+
+    for inventory_id, amount in sorted(needs.items()):
+        db.session.execute(
+            update(Inventory)
+            .where(Inventory.item_id == inventory_id)
+            .values(quantity=Inventory.quantity + amount, last_updated=now)
+            .execution_options(synchronize_session=False)
+        )
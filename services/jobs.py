@@ -0,0 +1,363 @@
+"""
+Inspection Jobs
+Hàng đợi job nền lưu trong database cho kiểm tra VSATTP bằng AI: request web chỉ tạo job và trả 202,
+worker pool trong process (hoặc `flask run-jobs`) nhận job, gọi model với số job song song giới hạn
+và thử lại có backoff khi lỗi tạm thời.
+Kiểm tra hàng loạt (InspectionBatch): kết quả từng job được giữ trên job, khi job cuối cùng xong
+toàn bộ InventoryInspection và trạng thái AI của kho được ghi trong 1 transaction.
+"""
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_, update
+from models import db, Inventory, InventoryInspection, InspectionBatch, InspectionJob
+from services.ai_client import inspect_ingredient_image, TransientAIError
+from services.engine import run_in_write_transaction
+
+
+def enqueue_inspections(entries, user_id=None, batch=False):
+    """Tạo job cho [(inventory_id, image_url)] trong 1 transaction và đánh thức worker.
+
+    batch=True: gom các job vào 1 InspectionBatch, kết quả được ghi cùng lúc khi cả lượt xong.
+    """
+    batch_id = uuid.uuid4().hex if batch else None
+    max_attempts = current_app.config['JOB_MAX_ATTEMPTS']
+
+    def add_jobs():
+        if batch_id:
+            db.session.add(InspectionBatch(batch_id=batch_id, total_jobs=len(entries), created_by=user_id))
+        jobs = [
+            InspectionJob(
+                batch_id=batch_id,
+                inventory_id=inventory_id,
+                image_url=image_url,
+                max_attempts=max_attempts,
+                created_by=user_id,
+            )
+            for inventory_id, image_url in entries
+        ]
+        db.session.add_all(jobs)
+        return jobs
+
+    jobs = run_in_write_transaction(add_jobs)
+    wake_worker()
+    return jobs
+
+
+def _lease_expired(now):
+    """Job đang chạy nhưng quá thời gian giữ (worker cũ đã chết)"""
+    lease_expired = now - timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    return and_(InspectionJob.status == 'running', InspectionJob.started_at < lease_expired)
+
+
+def _claimable(now):
+    """Job đến hạn: đang chờ tới run_at, hoặc hết thời gian giữ mà còn lượt thử"""
+    return or_(
+        and_(InspectionJob.status == 'queued', InspectionJob.run_at <= now),
+        and_(_lease_expired(now), InspectionJob.attempts < InspectionJob.max_attempts),
+    )
+
+
+def _fail_abandoned_jobs(now):
+    """Job hết thời gian giữ và đã dùng hết lượt thử (worker chết ở mọi lần chạy): đánh dấu failed
+    thay vì nhận lại mãi (caller đang giữ transaction ghi)"""
+    abandoned = and_(_lease_expired(now), InspectionJob.attempts >= InspectionJob.max_attempts)
+    rows = db.session.query(InspectionJob.job_id, InspectionJob.batch_id).filter(abandoned).all()
+
+    for job_id, batch_id in rows:
+        result = db.session.execute(
+            update(InspectionJob)
+            .where(InspectionJob.job_id == job_id, abandoned)
+            .values(status='failed', error='Worker dừng khi đang chạy job, đã hết số lần thử', finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            current_app.logger.error('Job kiểm tra AI %s thất bại: worker dừng ở mọi lần thử', job_id)
+            if batch_id is not None:
+                _complete_batch_if_done(_lock_batch(batch_id), now)
+
+
+def claim_next_job():
+    """Nhận 1 job đến hạn, trả về job_id hoặc None.
+
+    UPDATE có điều kiện: khi nhiều worker cùng chọn 1 job chỉ 1 worker cập nhật được (rowcount = 1).
+    """
+    now = datetime.utcnow()
+
+    def claim():
+        _fail_abandoned_jobs(now)
+        candidates = db.session.query(InspectionJob.job_id).filter(_claimable(now)).order_by(
+            InspectionJob.run_at, InspectionJob.job_id
+        ).limit(10).all()
+
+        for (job_id,) in candidates:
+            result = db.session.execute(
+                update(InspectionJob)
+                .where(InspectionJob.job_id == job_id, _claimable(now))
+                .values(status='running', started_at=now, attempts=InspectionJob.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                return job_id
+        return None
+
+    return run_in_write_transaction(claim)
+
+
+def _inspection_row(inventory_id, image_url, data, now):
+    return InventoryInspection(
+        inventory_id=inventory_id,
+        image_url=image_url,
+        ai_status=data.get('status'),
+        ai_issues=', '.join(data.get('issues') or []),
+        ai_confidence=data.get('confidence'),
+        ai_recommendation=data.get('recommendation'),
+        inspected_at=now,
+    )
+
+
+def apply_inspection(item, image_url, data, now):
+    """Ghi kết quả AI: thêm InventoryInspection và cập nhật trạng thái AI của nguyên liệu (caller commit)"""
+    inspection = _inspection_row(item.item_id, image_url, data, now)
+    item.ai_status = data.get('status')
+    item.ai_checked_at = now
+    db.session.add(inspection)
+    return inspection
+
+
+def _lock_batch(batch_id):
+    """Đọc và khóa lượt kiểm tra (SELECT ... FOR UPDATE): các job cùng lượt kết thúc lần lượt,
+    job xong sau cùng luôn thấy các job kia đã xong nên lượt không bao giờ bị bỏ dở"""
+    return InspectionBatch.query.filter_by(batch_id=batch_id).with_for_update().populate_existing().one()
+
+
+def _complete_batch_if_done(batch, now):
+    """Khi mọi job của lượt đã xong: ghi toàn bộ kết quả (caller đang giữ transaction ghi và khóa batch)"""
+    if batch.status != 'running':
+        return
+    pending = InspectionJob.query.filter(
+        InspectionJob.batch_id == batch.batch_id,
+        InspectionJob.status.in_(('queued', 'running'))
+    ).count()
+    if pending:
+        return
+
+    succeeded = InspectionJob.query.filter_by(batch_id=batch.batch_id, status='succeeded').order_by(
+        InspectionJob.job_id
+    ).all()
+    results = [(job, json.loads(job.result)) for job in succeeded]
+
+    inspections = [_inspection_row(job.inventory_id, job.image_url, data, now) for job, data in results]
+    db.session.add_all(inspections)
+    db.session.flush()
+    for (job, _), inspection in zip(results, inspections):
+        job.inspection_id = inspection.id
+
+    # Mỗi nguyên liệu lấy kết quả của job sau cùng, cập nhật kho bằng 1 lệnh UPDATE theo khóa chính
+    latest = {job.inventory_id: data for job, data in results}
+    if latest:
+        db.session.execute(update(Inventory), [
+            {'item_id': inventory_id, 'ai_status': data.get('status'), 'ai_checked_at': now}
+            for inventory_id, data in latest.items()
+        ])
+
+    batch.status = 'completed'
+    batch.completed_at = now
+
+
+def run_job(job_id):
+    """Chạy 1 job đã nhận. Không giữ transaction trong lúc chờ model trả lời."""
+    job = db.session.get(InspectionJob, job_id)
+    image_url = job.image_url
+    db.session.commit()
+
+    try:
+        data = inspect_ingredient_image(current_app.config['PUBLIC_BASE_URL'] + image_url)
+    except TransientAIError as e:
+        _retry_or_fail(job_id, e)
+    except Exception as e:
+        _finish(job_id, 'failed', error=str(e))
+    else:
+        _finish(job_id, 'succeeded', data=data)
+
+
+def _retry_or_fail(job_id, error):
+    def schedule_retry():
+        job = db.session.get(InspectionJob, job_id)
+        if job.attempts >= job.max_attempts:
+            return None
+
+        backoff = current_app.config['JOB_RETRY_BACKOFF_SECONDS'] * 2 ** (job.attempts - 1)
+        job.status = 'queued'
+        job.run_at = datetime.utcnow() + timedelta(seconds=backoff)
+        job.error = str(error)
+        return backoff
+
+    backoff = run_in_write_transaction(schedule_retry)
+    if backoff is None:
+        _finish(job_id, 'failed', error=str(error))
+    else:
+        current_app.logger.warning('Job kiểm tra AI %s lỗi tạm thời, thử lại sau %ss: %s', job_id, backoff, error)
+
+
+def _finish(job_id, status, data=None, error=None):
+    def finish():
+        now = datetime.utcnow()
+        job = db.session.get(InspectionJob, job_id)
+        # Khóa lượt trước khi đổi trạng thái job để việc đếm job còn lại không chạy song song
+        batch = _lock_batch(job.batch_id) if job.batch_id is not None else None
+        if data is not None:
+            job.result = json.dumps(data, ensure_ascii=False)
+            if job.batch_id is None:
+                item = db.session.get(Inventory, job.inventory_id)
+                job.inspection = apply_inspection(item, job.image_url, data, now)
+        job.status = status
+        job.error = error
+        job.finished_at = now
+
+        if batch is not None:
+            db.session.flush()
+            _complete_batch_if_done(batch, now)
+
+    run_in_write_transaction(finish)
+    if error:
+        current_app.logger.error('Job kiểm tra AI %s thất bại: %s', job_id, error)
+
+
+def job_status(job):
+    """Trạng thái job cho API polling"""
+    return {
+        'job_id': job.job_id,
+        'batch_id': job.batch_id,
+        'inventory_id': job.inventory_id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': json.loads(job.result) if job.result else None,
+    }
+
+
+def batch_status(batch):
+    """Tiến độ và tổng hợp kết quả của 1 lượt kiểm tra"""
+    counts = {'queued': 0, 'running': 0, 'succeeded': 0, 'failed': 0}
+    results = {'safe': 0, 'warning': 0, 'unsafe': 0}
+    jobs = []
+    for job in batch.jobs:
+        status = job_status(job)
+        status['inventory_name'] = job.inventory.name
+        counts[job.status] = counts.get(job.status, 0) + 1
+        if status['result'] and status['result'].get('status') in results:
+            results[status['result']['status']] += 1
+        jobs.append(status)
+
+    return {
+        'batch_id': batch.batch_id,
+        'status': batch.status,
+        'total': batch.total_jobs,
+        'done': counts['succeeded'] + counts['failed'],
+        'counts': counts,
+        'results': results,
+        'created_at': batch.created_at.isoformat() if batch.created_at else None,
+        'completed_at': batch.completed_at.isoformat() if batch.completed_at else None,
+        'jobs': jobs,
+    }
+
+
+class JobWorker:
+    """Luồng điều phối nhận job đến hạn và chạy trên thread pool, tối đa JOB_CONCURRENCY job cùng lúc"""
+
+    def __init__(self, app):
+        self.app = app
+        self.concurrency = app.config['JOB_CONCURRENCY']
+        self.poll_seconds = app.config['JOB_POLL_SECONDS']
+        self._slots = threading.Semaphore(self.concurrency)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='inspection-job')
+            self._thread = threading.Thread(target=self._dispatch, name='inspection-dispatcher', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            if self._thread is not None:
+                self._thread.join()
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+            self._thread = self._pool = None
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            # Chờ có chỗ trống trong pool trước khi nhận job (job đã nhận luôn được chạy ngay)
+            self._slots.acquire()
+            if self._stop.is_set():
+                self._slots.release()
+                break
+
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    job_id = claim_next_job()
+            except Exception:
+                self.app.logger.exception('Không nhận được job kiểm tra AI')
+                job_id = None
+
+            if job_id is None:
+                self._slots.release()
+                self._wake.wait(self.poll_seconds)
+                continue
+
+            try:
+                self._pool.submit(self._run, job_id)
+            except RuntimeError:
+                # Interpreter đang tắt: job sẽ được nhận lại khi hết thời gian giữ
+                self._slots.release()
+                break
+
+    def _run(self, job_id):
+        try:
+            with self.app.app_context():
+                run_job(job_id)
+        except Exception:
+            self.app.logger.exception('Job kiểm tra AI %s lỗi', job_id)
+        finally:
+            self._slots.release()
+
+
+def init_job_worker(app):
+    """Tạo worker cho app; khi JOB_WORKER_ENABLED, worker khởi động ở request đầu tiên (không chạy cho lệnh CLI)"""
+    worker = JobWorker(app)
+    app.extensions['job_worker'] = worker
+
+    if app.config['JOB_WORKER_ENABLED']:
+        app.before_request(worker.start)
+    return worker
+
+
+def wake_worker():
+    """Báo worker trong process có job mới (worker ở process khác sẽ thấy ở lượt poll kế tiếp)"""
+    if current_app.config['JOB_WORKER_ENABLED']:
+        worker = current_app.extensions['job_worker']
+        worker.start()
+        worker.wake()
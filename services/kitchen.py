@@ -0,0 +1,134 @@
+"""
+Kitchen Queue
+Truy vấn hàng đợi bếp: danh sách món cần nấu (eager load cho template)
+và phiếu bếp gọn theo đơn/bàn cho API đồng bộ theo cursor
+"""
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from models import db, Order, OrderItem, Menu, Table, User
+from services.timerange import day_range, in_range
+
+ACTIVE_ORDER_STATUSES = ('pending', 'preparing')
+ACTIVE_ITEM_STATUSES = ('pending', 'preparing')
+
+# Đơn đặt trước lên trước; trong cùng đơn, món lâu hơn được nấu trước
+_queue_order = (Order.order_time, Order.order_id, Menu.preparation_time.desc(), OrderItem.order_item_id)
+
+
+def kitchen_queue():
+    """Các món đang chờ/đang nấu (kèm menu, đầu bếp, đơn, bàn) theo thứ tự nấu"""
+    return OrderItem.query.join(Order).join(Menu).options(
+        db.contains_eager(OrderItem.menu_item),
+        db.contains_eager(OrderItem.order).joinedload(Order.table),
+        db.joinedload(OrderItem.chef)
+    ).filter(
+        Order.status.in_(ACTIVE_ORDER_STATUSES),
+        OrderItem.status.in_(ACTIVE_ITEM_STATUSES)
+    ).order_by(*_queue_order).all()
+
+
+def queue_counts(items):
+    """Số món chờ và đang nấu trong hàng đợi"""
+    pending_count = sum(1 for i in items if i.status == 'pending')
+    preparing_count = sum(1 for i in items if i.status == 'preparing')
+    return pending_count, preparing_count
+
+
+def completed_today():
+    """Các món đã xong của đơn hoàn thành trong hôm nay"""
+    return OrderItem.query.join(Order).options(
+        db.joinedload(OrderItem.menu_item),
+        db.contains_eager(OrderItem.order).joinedload(Order.table)
+    ).filter(
+        OrderItem.status == 'completed',
+        in_range(Order.completed_time, day_range(date.today()))
+    ).order_by(Order.completed_time.desc()).all()
+
+
+def format_cursor(value):
+    return value.isoformat() if value else None
+
+
+def parse_cursor(cursor):
+    """Cursor là thời điểm thay đổi (ISO 8601); raise ValueError nếu không hợp lệ"""
+    return datetime.fromisoformat(cursor) if cursor else None
+
+
+def kitchen_tickets(since=None):
+    """Phiếu bếp theo đơn thay đổi từ `since` (None: toàn bộ hàng đợi).
+
+    Trả về dict gồm:
+        tickets: phiếu của các đơn còn món cần nấu (thay thế toàn bộ phiếu cũ cùng order_id)
+        removed: order_id đã rời hàng đợi (xong/hủy) kể từ cursor
+        cursor: truyền lại vào `since` ở lần gọi sau
+    updated_at được đặt lúc flush, trước commit: transaction flush trước nhưng commit sau có thể mang
+    tem nhỏ hơn cursor client đã nhận. Vì vậy mỗi lần đọc lại cả KITCHEN_SYNC_WINDOW_SECONDS trước
+    cursor; đơn trong khoảng đó được trả lại, client ghi đè theo order_id (bỏ qua nếu cùng version).
+    """
+    changed_orders = None
+
+    if since is None:
+        cursor = db.session.query(func.max(Order.updated_at)).scalar()
+    else:
+        # updated_at được tăng cùng version mỗi khi đơn/món thay đổi (services.order_version)
+        window = timedelta(seconds=current_app.config['KITCHEN_SYNC_WINDOW_SECONDS'])
+        changed = db.session.query(Order.order_id, Order.updated_at).filter(
+            Order.updated_at >= since - window
+        ).all()
+        changed_orders = {order_id for order_id, _ in changed}
+        # Cursor không lùi lại dù chỉ có đơn trong khoảng đọc lại
+        cursor = max([since] + [changed_at for _, changed_at in changed])
+        if not changed_orders:
+            return {'tickets': [], 'removed': [], 'cursor': format_cursor(cursor)}
+
+    query = db.session.query(
+        Order.order_id, Order.version, Order.order_type, Order.status.label('order_status'), Order.order_time,
+        Table.table_number,
+        OrderItem.order_item_id, OrderItem.quantity, OrderItem.status, OrderItem.notes,
+        Menu.name, Menu.preparation_time, User.name.label('chef_name')
+    ).select_from(OrderItem).join(
+        Order, OrderItem.order_id == Order.order_id
+    ).join(
+        Menu, OrderItem.menu_id == Menu.menu_id
+    ).outerjoin(
+        Table, Order.table_id == Table.table_id
+    ).outerjoin(
+        User, OrderItem.chef_id == User.user_id
+    ).filter(
+        Order.status.in_(ACTIVE_ORDER_STATUSES),
+        OrderItem.status.in_(ACTIVE_ITEM_STATUSES)
+    )
+    if changed_orders is not None:
+        query = query.filter(Order.order_id.in_(changed_orders))
+
+    tickets = {}
+    for row in query.order_by(*_queue_order):
+        ticket = tickets.get(row.order_id)
+        if ticket is None:
+            ticket = tickets[row.order_id] = {
+                'order_id': row.order_id,
+                'version': row.version,
+                'table_number': row.table_number,
+                'order_type': row.order_type,
+                'order_status': row.order_status,
+                'order_time': row.order_time.strftime('%Y-%m-%d %H:%M:%S'),
+                'items': [],
+            }
+        ticket['items'].append({
+            'order_item_id': row.order_item_id,
+            'name': row.name,
+            'quantity': row.quantity,
+            'status': row.status,
+            'notes': row.notes,
+            'preparation_time': row.preparation_time,
+            'chef_name': row.chef_name,
+        })
+
+    removed = sorted(changed_orders - tickets.keys()) if changed_orders is not None else []
+
+    return {
+        'tickets': list(tickets.values()),
+        'removed': removed,
+        'cursor': format_cursor(cursor),
+    }
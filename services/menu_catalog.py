@@ -0,0 +1,88 @@
+"""
+Menu Catalog
+Ảnh chụp bất biến của các món đang phục vụ (kèm danh mục và nguyên liệu), giữ trong process
+và chỉ dựng lại khi phiên bản 'menu' thay đổi, để các trang đọc menu không phải truy vấn database
+"""
+import threading
+from collections import namedtuple
+from flask import current_app
+from models import db, Menu
+from services.versions import get_version, bump_version
+
+MENU_VERSION = 'menu'
+
+MenuEntry = namedtuple('MenuEntry', [
+    'menu_id', 'name', 'description', 'price', 'category', 'image_url', 'image_variants',
+    'preparation_time', 'calories', 'ingredients'
+])
+IngredientEntry = namedtuple('IngredientEntry', ['inventory_id', 'quantity_needed'])
+
+
+class MenuCatalog:
+    """Danh sách món available tại 1 phiên bản (không sửa sau khi tạo)"""
+
+    def __init__(self, version, items):
+        self.version = version
+        self.items = tuple(items)
+        self.by_id = {item.menu_id: item for item in self.items}
+
+        counts = {}
+        for item in self.items:
+            counts[item.category] = counts.get(item.category, 0) + 1
+        self.categories = tuple(counts.items())
+
+    def get(self, menu_id):
+        return self.by_id.get(menu_id)
+
+    def in_category(self, category=None):
+        if not category or category == 'all':
+            return list(self.items)
+        return [item for item in self.items if item.category == category]
+
+
+def _load_catalog(version):
+    menus = Menu.query.options(
+        db.selectinload(Menu.ingredients)
+    ).filter(Menu.available == True).order_by(Menu.menu_id).all()
+
+    return MenuCatalog(version, (
+        MenuEntry(
+            menu_id=m.menu_id,
+            name=m.name,
+            description=m.description,
+            price=m.price,
+            category=m.category,
+            image_url=m.image_url,
+            image_variants=m.image_variants,
+            preparation_time=m.preparation_time,
+            calories=m.calories,
+            ingredients=tuple(
+                IngredientEntry(i.inventory_id, i.quantity_needed) for i in m.ingredients
+            ),
+        )
+        for m in menus
+    ))
+
+
+_lock = threading.Lock()
+
+
+def get_catalog():
+    """Catalog hiện tại; dựng lại từ database khi phiên bản menu đã đổi"""
+    version = get_version(MENU_VERSION)
+    catalog = current_app.extensions.get('menu_catalog')
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _lock:
+        catalog = current_app.extensions.get('menu_catalog')
+        if catalog is None or catalog.version != version:
+            # Đọc version trước khi tải: thay đổi xảy ra trong lúc tải sẽ làm lần đọc sau dựng lại
+            catalog = _load_catalog(version)
+            current_app.extensions['menu_catalog'] = catalog
+        return catalog
+
+
+def invalidate_catalog():
+    """Gọi sau khi commit thay đổi món ăn hoặc nguyên liệu của món"""
+    bump_version(MENU_VERSION)
@@ -0,0 +1,125 @@
+"""
+Menu Search
+Chỉ mục tìm kiếm trong bộ nhớ trên tên và mô tả món ăn: bỏ dấu tiếng Việt ("pho bo" khớp "Phở bò"),
+xếp hạng theo độ hiếm của từ và hỗ trợ tìm theo tiền tố. Dựng lại cùng catalog menu khi menu thay đổi.
+"""
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from flask import current_app
+from services.menu_catalog import get_catalog
+
+# Trọng số theo trường và theo kiểu khớp
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+PREFIX_FACTOR = 0.6
+ACCENT_BONUS = 1.2  # Khớp đúng cả dấu ("bò" ưu tiên "Phở Bò" hơn "Sinh Tố Bơ")
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """Chữ thường, bỏ dấu (kể cả đ -> d)"""
+    text = unicodedata.normalize('NFD', (text or '').lower().replace('đ', 'd'))
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return _WORD_RE.findall(fold(text))
+
+
+def _raw_tokens(text):
+    """Token giữ nguyên dấu, cùng thứ tự với tokenize()"""
+    return _WORD_RE.findall(unicodedata.normalize('NFC', (text or '').lower()))
+
+
+class MenuSearchIndex:
+    """Chỉ mục đảo token -> {menu_id: trọng số} cho 1 phiên bản catalog"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._postings = {}
+        self._accented = {}  # menu_id -> token có dấu
+
+        for item in catalog.items:
+            self._accented[item.menu_id] = set(_raw_tokens(item.name)) | set(_raw_tokens(item.description))
+            for tokens, weight in ((tokenize(item.name), NAME_WEIGHT),
+                                   (tokenize(item.description), DESCRIPTION_WEIGHT)):
+                for token in set(tokens):
+                    postings = self._postings.setdefault(token, {})
+                    postings[item.menu_id] = max(postings.get(item.menu_id, 0), weight)
+
+        # Danh sách token đã sắp xếp để tìm tiền tố bằng bisect
+        self._tokens = sorted(self._postings)
+        self._size = max(len(catalog.items), 1)
+
+    def _matches(self, token, prefix):
+        """[(token trong chỉ mục, hệ số khớp)] cho 1 token truy vấn"""
+        matches = [(token, 1.0)] if token in self._postings else []
+        if prefix:
+            i = bisect.bisect_left(self._tokens, token)
+            while i < len(self._tokens) and self._tokens[i].startswith(token):
+                if self._tokens[i] != token:
+                    matches.append((self._tokens[i], PREFIX_FACTOR))
+                i += 1
+        return matches
+
+    def search(self, query, match_all=True, prefix=True, limit=None):
+        """Các món khớp truy vấn, xếp theo điểm giảm dần.
+
+        match_all=True: món phải khớp mọi từ (ô tìm kiếm).
+        match_all=False: khớp bất kỳ từ nào, ưu tiên món khớp nhiều từ (câu hỏi chatbot).
+        """
+        terms = dict(zip(tokenize(query), _raw_tokens(query)))
+        if not terms:
+            return []
+
+        scores = {}
+        matched_terms = {}
+        for term, raw_term in terms.items():
+            term_scores = {}
+            for token, factor in self._matches(term, prefix):
+                postings = self._postings[token]
+                idf = math.log(1 + self._size / len(postings))
+                for menu_id, weight in postings.items():
+                    score = weight * idf * factor
+                    if raw_term in self._accented[menu_id]:
+                        score *= ACCENT_BONUS
+                    term_scores[menu_id] = max(term_scores.get(menu_id, 0), score)
+
+            for menu_id, score in term_scores.items():
+                scores[menu_id] = scores.get(menu_id, 0) + score
+                matched_terms[menu_id] = matched_terms.get(menu_id, 0) + 1
+
+        if match_all:
+            ranked = [menu_id for menu_id in scores if matched_terms[menu_id] == len(terms)]
+        else:
+            ranked = list(scores)
+
+        ranked.sort(key=lambda menu_id: (-matched_terms[menu_id], -scores[menu_id], menu_id))
+        results = [self.catalog.get(menu_id) for menu_id in ranked]
+        return results[:limit] if limit else results
+
+
+_lock = threading.Lock()
+
+
+def get_search_index():
+    """Chỉ mục của catalog menu hiện tại (dựng lại khi catalog được dựng lại)"""
+    catalog = get_catalog()
+    index = current_app.extensions.get('menu_search_index')
+    if index is not None and index.catalog is catalog:
+        return index
+
+    with _lock:
+        index = current_app.extensions.get('menu_search_index')
+        if index is None or index.catalog is not catalog:
+            index = MenuSearchIndex(catalog)
+            current_app.extensions['menu_search_index'] = index
+        return index
+
+
+def search_menu(query, **kwargs):
+    return get_search_index().search(query, **kwargs)
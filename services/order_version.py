@@ -0,0 +1,54 @@
+"""
+Order Version
+Tem phiên bản cho từng đơn hàng, tự tăng khi đơn, món, thanh toán hoặc shipper thay đổi,
+để API trạng thái trả về 304 Not Modified mà không cần nạp toàn bộ đơn hàng
+"""
+from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from models import Order, OrderItem, Payment
+
+
+def _changed_order_ids(session):
+    """Các đơn hàng (đã có trong database) bị ảnh hưởng bởi lần flush này"""
+    order_ids = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Order):
+            if obj not in session.new and session.is_modified(obj, include_collections=False):
+                order_ids.add(obj.order_id)
+        elif isinstance(obj, (OrderItem, Payment)):
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            order_id = obj.order_id or (obj.order.order_id if obj.order is not None else None)
+            if order_id:
+                order_ids.add(order_id)
+
+    return order_ids
+
+
+def _bump_order_versions(session, flush_context, instances):
+    with session.no_autoflush:
+        order_ids = _changed_order_ids(session)
+        if not order_ids:
+            return
+
+        now = datetime.utcnow()
+        for order_id in order_ids:
+            order = session.get(Order, order_id)
+            if order is None or order in session.deleted:
+                continue
+            # Tăng ngay trong câu UPDATE để các request song song không ghi đè lẫn nhau
+            order.version = func.coalesce(Order.version, 0) + 1
+            order.updated_at = now
+
+
+def register_order_versioning():
+    """Gắn hook before_flush cho mọi session (gọi một lần khi khởi tạo app)"""
+    if not event.contains(Session, 'before_flush', _bump_order_versions):
+        event.listen(Session, 'before_flush', _bump_order_versions)
+
+
+def order_etag(order_id, version):
+    return f'order-{order_id}-v{version or 0}'
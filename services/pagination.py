@@ -0,0 +1,133 @@
+"""
+Keyset Pagination
+Phân trang theo khóa (thời gian, id) thay cho OFFSET/.all(): mỗi trang chỉ đọc per_page + 1 dòng
+tiếp theo sau cursor, chi phí không tăng theo số lượng lịch sử
+"""
+import base64
+from datetime import date, datetime
+from flask import current_app, request, url_for, jsonify, abort
+from sqlalchemy import and_, or_, func
+
+# Thay giá trị NULL khi sắp xếp theo cột thời gian có thể rỗng (VD: payment_time của thanh toán chờ)
+NULL_TIME = datetime(1970, 1, 1)
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f'{timestamp.isoformat() if timestamp else ""}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) từ cursor; raise ValueError nếu cursor không hợp lệ"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(row_id)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f'Cursor không hợp lệ: {cursor}') from e
+
+
+def page_size():
+    """Số dòng mỗi trang từ ?per_page=, giới hạn bởi PAGE_SIZE/MAX_PAGE_SIZE"""
+    per_page = request.args.get('per_page', type=int) or current_app.config['PAGE_SIZE']
+    return max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+
+
+class KeysetPage:
+    """Một trang kết quả và cursor để lấy trang tiếp theo"""
+
+    def __init__(self, items, cursor, next_cursor, per_page):
+        self.items = items
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def url_for_cursor(self, cursor, **extra):
+        """URL của view hiện tại với cùng bộ lọc, thay cursor"""
+        args = request.args.to_dict()
+        args.pop('cursor', None)
+        args.pop('format', None)
+        if cursor:
+            args['cursor'] = cursor
+        args.update(extra)
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    @property
+    def next_url(self):
+        return self.url_for_cursor(self.next_cursor) if self.next_cursor else None
+
+    @property
+    def first_url(self):
+        return self.url_for_cursor(None)
+
+
+def keyset_paginate(query, time_column, id_column, descending=True, nullable=False):
+    """Trang kế tiếp của query theo (time_column, id_column) với cursor lấy từ ?cursor=.
+
+    nullable=True: coi thời gian NULL là NULL_TIME (cùng thứ tự trên SQLite và PostgreSQL).
+    Cursor sai định dạng -> 400.
+    """
+    per_page = page_size()
+    cursor = request.args.get('cursor') or None
+
+    time_key = func.coalesce(time_column, NULL_TIME) if nullable else time_column
+
+    if cursor:
+        try:
+            after_time, after_id = decode_cursor(cursor)
+        except ValueError:
+            abort(400)
+        after_time = after_time or NULL_TIME
+        if descending:
+            query = query.filter(or_(time_key < after_time, and_(time_key == after_time, id_column < after_id)))
+        else:
+            query = query.filter(or_(time_key > after_time, and_(time_key == after_time, id_column > after_id)))
+
+    if descending:
+        query = query.order_by(time_key.desc(), id_column.desc())
+    else:
+        query = query.order_by(time_key.asc(), id_column.asc())
+
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        timestamp = getattr(last, time_column.key)
+        next_cursor = encode_cursor(timestamp or (NULL_TIME if nullable else None), getattr(last, id_column.key))
+
+    return KeysetPage(rows, cursor, next_cursor, per_page)
+
+
+def wants_json():
+    """Client 'xem thêm' yêu cầu JSON (?format=json)"""
+    return request.args.get('format') == 'json'
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def serialize_row(obj, exclude=()):
+    """Các cột của model thành dict (bỏ các cột trong exclude)"""
+    return {
+        column.key: _json_value(getattr(obj, column.key))
+        for column in obj.__table__.columns
+        if column.key not in exclude
+    }
+
+
+def page_json(page, exclude=()):
+    return jsonify({
+        'items': [serialize_row(item, exclude) for item in page.items],
+        'next_cursor': page.next_cursor,
+        'next_url': page.url_for_cursor(page.next_cursor, format='json') if page.has_more else None,
+        'per_page': page.per_page,
+    })
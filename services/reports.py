@@ -0,0 +1,58 @@
+"""
+Reports
+Các truy vấn tổng hợp cho trang báo cáo, dùng chung cho trang HTML và file export
+"""
+from sqlalchemy import func
+from models import db, User, Menu, Order, OrderItem, Payment
+from services.timerange import in_range, day_of
+
+
+def daily_revenue_query(period):
+    """Doanh thu theo ngày (thanh toán đã hoàn tất)"""
+    payment_day = day_of(Payment.payment_time)
+    return db.session.query(
+        payment_day.label('date'),
+        func.sum(Payment.final_amount).label('revenue')
+    ).filter(
+        Payment.payment_status == 'completed',
+        in_range(Payment.payment_time, period)
+    ).group_by(payment_day).order_by('date')
+
+
+def top_dishes_query(period, limit=10):
+    """Món bán chạy của các đơn hoàn thành"""
+    query = db.session.query(
+        Menu.name,
+        func.sum(OrderItem.quantity).label('total_sold'),
+        func.sum(OrderItem.quantity * OrderItem.price).label('revenue')
+    ).join(OrderItem).join(Order).filter(
+        Order.status == 'completed',
+        in_range(Order.completed_time, period)
+    ).group_by(Menu.menu_id).order_by(func.sum(OrderItem.quantity).desc())
+    return query.limit(limit) if limit else query
+
+
+def order_types_query(period):
+    """Số đơn và doanh thu theo loại đơn"""
+    return db.session.query(
+        Order.order_type,
+        func.count(Order.order_id).label('count'),
+        func.sum(Order.total_amount).label('revenue')
+    ).filter(
+        Order.status == 'completed',
+        in_range(Order.completed_time, period)
+    ).group_by(Order.order_type)
+
+
+def top_customers_query(period, limit=10):
+    """Khách hàng chi tiêu nhiều nhất"""
+    query = db.session.query(
+        User.name,
+        User.email,
+        func.count(Order.order_id).label('order_count'),
+        func.sum(Order.total_amount).label('total_spent')
+    ).join(Order, User.user_id == Order.customer_id).filter(
+        Order.status == 'completed',
+        in_range(Order.completed_time, period)
+    ).group_by(User.user_id).order_by(func.sum(Order.total_amount).desc())
+    return query.limit(limit) if limit else query
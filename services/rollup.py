@@ -0,0 +1,188 @@
+"""
+Sales Rollup
+Duy trì bảng tổng hợp doanh thu/chi phí theo ngày để dashboard không phải quét toàn bộ lịch sử đơn hàng
+"""
+from datetime import date, datetime
+from sqlalchemy import func
+from models import db, Order, OrderItem, Payment, Menu, DailySalesRollup, DailyMenuSales
+from services.timerange import day_of
+
+# Cột đếm đơn tương ứng với từng loại đơn
+ORDER_TYPE_COLUMNS = {
+    'dine-in': 'dine_in_orders',
+    'takeaway': 'takeaway_orders',
+    'delivery': 'delivery_orders',
+}
+
+
+def _insert_for_dialect():
+    """Chọn hàm insert hỗ trợ ON CONFLICT theo loại database"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _upsert_increment(model, keys, increments):
+    """Cộng dồn vào một dòng tổng hợp, tạo mới nếu chưa có (nguyên tử trong 1 câu lệnh)"""
+    insert = _insert_for_dialect()
+    table = model.__table__
+
+    stmt = insert(table).values(**keys, **increments)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={col: table.c[col] + stmt.excluded[col] for col in increments}
+    )
+    db.session.execute(stmt)
+
+
+def _as_date(value):
+    """Ngày GROUP BY trả về chuỗi trên SQLite và date trên PostgreSQL"""
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def order_ingredient_cost(order_id):
+    """Chi phí nguyên liệu của một đơn hàng (theo giá vốn đã chốt trên OrderItem)"""
+    return db.session.query(
+        func.sum(OrderItem.line_cost)
+    ).filter(OrderItem.order_id == order_id).scalar() or 0
+
+
+def record_payment(payment):
+    """Ghi nhận doanh thu của thanh toán vừa hoàn tất (gọi trước commit)"""
+    if not payment.payment_time:
+        return
+
+    _upsert_increment(
+        DailySalesRollup,
+        {'day': payment.payment_time.date()},
+        {'revenue': payment.final_amount or 0}
+    )
+
+
+def record_completed_order(order):
+    """Ghi nhận chi phí, số đơn và số món của đơn vừa chuyển sang completed (gọi trước commit)"""
+    day = (order.completed_time or datetime.utcnow()).date()
+
+    increments = {
+        'ingredient_cost': order_ingredient_cost(order.order_id),
+        'completed_orders': 1,
+    }
+    type_column = ORDER_TYPE_COLUMNS.get(order.order_type)
+    if type_column:
+        increments[type_column] = 1
+
+    _upsert_increment(DailySalesRollup, {'day': day}, increments)
+
+    # Gộp số lượng theo món trước khi ghi
+    menu_sales = {}
+    for item in order.order_items:
+        quantity, revenue = menu_sales.get(item.menu_id, (0, 0))
+        menu_sales[item.menu_id] = (quantity + item.quantity, revenue + item.quantity * item.price)
+
+    for menu_id, (quantity, revenue) in menu_sales.items():
+        _upsert_increment(
+            DailyMenuSales,
+            {'day': day, 'menu_id': menu_id},
+            {'quantity': quantity, 'revenue': revenue}
+        )
+
+
+def rebuild_rollup():
+    """Tính lại toàn bộ bảng tổng hợp từ lịch sử đơn hàng. Trả về số ngày đã tổng hợp"""
+    DailyMenuSales.query.delete()
+    DailySalesRollup.query.delete()
+
+    rollups = {}
+
+    def rollup_for(day):
+        day = _as_date(day)
+        if day not in rollups:
+            rollups[day] = DailySalesRollup(
+                day=day, revenue=0, ingredient_cost=0, completed_orders=0,
+                dine_in_orders=0, takeaway_orders=0, delivery_orders=0
+            )
+        return rollups[day]
+
+    payment_day = day_of(Payment.payment_time)
+    for day, revenue in db.session.query(
+        payment_day, func.sum(Payment.final_amount)
+    ).filter(
+        Payment.payment_status == 'completed',
+        Payment.payment_time.isnot(None)
+    ).group_by(payment_day):
+        rollup_for(day).revenue = revenue or 0
+
+    completed_day = day_of(Order.completed_time)
+    completed_filter = (Order.status == 'completed', Order.completed_time.isnot(None))
+
+    for day, cost in db.session.query(
+        completed_day, func.sum(OrderItem.line_cost)
+    ).join(Order, OrderItem.order_id == Order.order_id
+    ).filter(*completed_filter).group_by(completed_day):
+        rollup_for(day).ingredient_cost = cost or 0
+
+    for day, order_type, count in db.session.query(
+        completed_day, Order.order_type, func.count(Order.order_id)
+    ).filter(*completed_filter).group_by(completed_day, Order.order_type):
+        rollup = rollup_for(day)
+        rollup.completed_orders += count
+        type_column = ORDER_TYPE_COLUMNS.get(order_type)
+        if type_column:
+            setattr(rollup, type_column, getattr(rollup, type_column) + count)
+
+    db.session.add_all(rollups.values())
+
+    db.session.add_all(
+        DailyMenuSales(day=_as_date(day), menu_id=menu_id, quantity=quantity, revenue=revenue or 0)
+        for day, menu_id, quantity, revenue in db.session.query(
+            completed_day,
+            OrderItem.menu_id,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.quantity * OrderItem.price)
+        ).join(Order, OrderItem.order_id == Order.order_id
+        ).filter(*completed_filter).group_by(completed_day, OrderItem.menu_id)
+    )
+
+    db.session.commit()
+    return len(rollups)
+
+
+def sales_totals():
+    """Tổng doanh thu, chi phí nguyên liệu và số đơn hoàn thành từ trước đến nay"""
+    return db.session.query(
+        func.coalesce(func.sum(DailySalesRollup.revenue), 0),
+        func.coalesce(func.sum(DailySalesRollup.ingredient_cost), 0),
+        func.coalesce(func.sum(DailySalesRollup.completed_orders), 0)
+    ).one()
+
+
+def daily_rollups(start, end):
+    """Các dòng tổng hợp trong khoảng [start, end], key theo ngày"""
+    return {
+        r.day: r
+        for r in DailySalesRollup.query.filter(
+            DailySalesRollup.day >= start,
+            DailySalesRollup.day <= end
+        )
+    }
+
+
+def top_menu_items(limit=5, start=None, end=None):
+    """Món bán chạy nhất dựa trên bảng tổng hợp"""
+    total_sold = func.sum(DailyMenuSales.quantity)
+    query = db.session.query(
+        Menu.name,
+        total_sold.label('total_sold'),
+        func.sum(DailyMenuSales.revenue).label('revenue')
+    ).join(DailyMenuSales, DailyMenuSales.menu_id == Menu.menu_id)
+
+    if start:
+        query = query.filter(DailyMenuSales.day >= start)
+    if end:
+        query = query.filter(DailyMenuSales.day <= end)
+
+    return query.group_by(Menu.menu_id).order_by(total_sold.desc()).limit(limit).all()
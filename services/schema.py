@@ -0,0 +1,54 @@
+"""
+Schema Upgrade
+Bổ sung cột và index mới cho database đã tồn tại (db.create_all chỉ tạo bảng chưa có)
+"""
+from sqlalchemy import inspect, text
+from models import db, User
+
+
+def upgrade_schema():
+    """Thêm các cột/index có trong models nhưng chưa có trong database. Trả về danh sách cột đã thêm"""
+    engine = db.engine
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    added = []
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                conn.execute(text('ALTER TABLE {} ADD COLUMN {} {}'.format(
+                    preparer.format_table(table),
+                    preparer.format_column(column),
+                    column.type.compile(dialect=engine.dialect)
+                )))
+                added.append(f'{table.name}.{column.name}')
+
+            # Index khai báo trong models nhưng chưa có trong database
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+    return added
+
+
+def init_database(seed=False):
+    """Tạo bảng còn thiếu, nâng cấp schema và (nếu seed) tạo dữ liệu mẫu khi chưa có user.
+
+    Chạy qua `flask init-db` / `flask seed` lúc triển khai thay vì mỗi lần khởi động worker.
+    Trả về (danh sách cột đã thêm, đã tạo dữ liệu mẫu hay không)
+    """
+    db.create_all()
+    added = upgrade_schema()
+
+    seeded = False
+    if seed and User.query.count() == 0:
+        from seed_data import seed_database
+        seed_database()
+        seeded = True
+    return added, seeded
@@ -0,0 +1,41 @@
+"""
+Time Range
+Chuyển bộ lọc ngày / tháng / khoảng ngày thành khoảng thời gian nửa mở [start, end)
+để database dùng được index trên cột thời gian (thay cho func.date(cột) == ngày)
+"""
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, cast, func, Date
+from models import db
+
+
+def day_range(day):
+    """Khoảng thời gian của một ngày: [00:00 ngày đó, 00:00 ngày hôm sau)"""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def month_range(year, month):
+    """Khoảng thời gian của một tháng: [ngày 1, ngày 1 tháng sau)"""
+    start = datetime(year, month, 1)
+    if month == 12:
+        return start, datetime(year + 1, 1, 1)
+    return start, datetime(year, month + 1, 1)
+
+
+def date_range(start_date, end_date):
+    """Khoảng thời gian từ đầu ngày start_date đến hết ngày end_date (tính cả end_date)"""
+    return datetime.combine(start_date, time.min), datetime.combine(end_date, time.min) + timedelta(days=1)
+
+
+def in_range(column, bounds):
+    """Điều kiện lọc column thuộc [start, end)"""
+    start, end = bounds
+    return and_(column >= start, column < end)
+
+
+def day_of(column):
+    """Phần ngày của cột thời gian (dùng cho GROUP BY theo ngày), chạy trên cả SQLite và PostgreSQL"""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # SQLite lưu DateTime dạng chuỗi, CAST AS DATE không dùng được
+        return func.date(column)
+    return cast(column, Date)
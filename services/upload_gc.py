@@ -0,0 +1,107 @@
+"""
+Upload GC
+Dọn file upload không còn được tham chiếu: ảnh món ăn (và các bản thumb/card/full) trong UPLOAD_FOLDER,
+ảnh kiểm tra nguyên liệu trong INSPECTION_UPLOAD_FOLDER. File mới hơn thời gian ân hạn được giữ lại
+vì có thể đang upload dở (file đã lưu nhưng dòng DB chưa commit).
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from models import db, Menu, InventoryInspection, InspectionJob
+
+# Ảnh mặc định của món ăn, luôn giữ
+KEEP_FILES = {'default.jpg'}
+
+OrphanFile = namedtuple('OrphanFile', ['path', 'size', 'mtime'])
+
+
+def _static_path(url):
+    """'/static/uploads/inventory/x.jpg' (hoặc URL đầy đủ) -> đường dẫn tuyệt đối trong static folder"""
+    if not url or '/static/' not in url:
+        return None
+    relative = url.split('/static/', 1)[1].split('?', 1)[0]
+    return os.path.normpath(os.path.join(current_app.static_folder, relative))
+
+
+def referenced_files():
+    """Tập đường dẫn tuyệt đối của mọi file upload đang được DB tham chiếu"""
+    menu_folder = current_app.config['UPLOAD_FOLDER']
+    paths = set()
+
+    for image_url, variants in db.session.query(Menu.image_url, Menu.image_variants):
+        if image_url:
+            paths.add(os.path.normpath(os.path.join(menu_folder, image_url)))
+        for variant in (variants or {}).values():
+            for value in variant.values():
+                if isinstance(value, str):
+                    paths.add(os.path.normpath(os.path.join(menu_folder, value)))
+
+    # Ảnh của job chưa chạy xong cũng phải giữ (kết quả chưa ghi vào InventoryInspection)
+    urls = db.session.query(InventoryInspection.image_url).union(
+        db.session.query(InspectionJob.image_url).filter(InspectionJob.status.in_(('queued', 'running')))
+    )
+    for (url,) in urls:
+        path = _static_path(url)
+        if path:
+            paths.add(path)
+    return paths
+
+
+def _scan_directory(directory):
+    """1 tầng thư mục: ([(đường dẫn, kích thước, mtime)], [thư mục con])"""
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((os.path.normpath(entry.path), stat.st_size, stat.st_mtime))
+    except FileNotFoundError:
+        pass
+    return files, subdirs
+
+
+def walk_files(roots, workers=None):
+    """Mọi file trong các thư mục gốc; mỗi thư mục được quét trên 1 thread (I/O song song)"""
+    files = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = [pool.submit(_scan_directory, root) for root in roots]
+        while pending:
+            future = pending.pop()
+            found, subdirs = future.result()
+            files.extend(found)
+            pending.extend(pool.submit(_scan_directory, subdir) for subdir in subdirs)
+    return files
+
+
+def find_orphans(grace_seconds, workers=None):
+    """Các file trong thư mục upload không được tham chiếu và cũ hơn grace_seconds"""
+    config = current_app.config
+    roots = [config['UPLOAD_FOLDER'], config['INSPECTION_UPLOAD_FOLDER']]
+
+    # Quét thư mục trước, đọc tham chiếu sau: file được upload giữa 2 bước hoặc còn mới đều nằm trong ân hạn
+    files = walk_files(roots, workers=workers)
+    referenced = referenced_files()
+    cutoff = time.time() - grace_seconds
+
+    return [
+        OrphanFile(path, size, mtime)
+        for path, size, mtime in files
+        if path not in referenced and os.path.basename(path) not in KEEP_FILES and mtime < cutoff
+    ]
+
+
+def collect_garbage(grace_seconds, dry_run=False, workers=None):
+    """Xóa file upload mồ côi (dry_run: chỉ liệt kê); trả về danh sách OrphanFile"""
+    orphans = find_orphans(grace_seconds, workers=workers)
+    if not dry_run:
+        for orphan in orphans:
+            try:
+                os.remove(orphan.path)
+            except FileNotFoundError:
+                pass
+    return orphans
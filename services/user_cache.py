@@ -0,0 +1,57 @@
+"""
+User Cache
+Cache người dùng đăng nhập trong process cho user_loader của Flask-Login: mỗi request gắn bản chụp
+vào session bằng merge(load=False) thay vì SELECT users. Mục cache hết hạn sau USER_CACHE_TTL_SECONDS
+và bị bỏ toàn bộ khi phiên bản 'users' đổi (dùng chung giữa các worker qua version store)
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy.orm import make_transient_to_detached
+from models import db, User
+from services.versions import get_version, bump_version
+
+USER_VERSION = 'users'
+
+_lock = threading.Lock()
+
+
+def _snapshot(user):
+    """Bản sao tách rời (chỉ các cột) của user, merge vào session khác mà không cần truy vấn"""
+    copy = User(**{column.key: getattr(user, column.key) for column in User.__mapper__.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+def _entries():
+    return current_app.extensions.setdefault('user_cache', OrderedDict())
+
+
+def load_user(user_id):
+    """user_loader: user từ cache nếu còn hạn và cùng phiên bản, nếu không thì đọc database"""
+    user_id = int(user_id)
+    version = get_version(USER_VERSION)
+    entries = _entries()
+
+    with _lock:
+        entry = entries.get(user_id)
+    if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+        return db.session.merge(entry[2], load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+
+    config = current_app.config
+    with _lock:
+        entries[user_id] = (version, time.monotonic() + config['USER_CACHE_TTL_SECONDS'], _snapshot(user))
+        entries.move_to_end(user_id)
+        while len(entries) > config['USER_CACHE_MAX_ENTRIES']:
+            entries.popitem(last=False)
+    return user
+
+
+def invalidate_users():
+    """Gọi sau khi commit thay đổi thông tin, quyền, trạng thái hoặc mật khẩu của user"""
+    bump_version(USER_VERSION)
@@ -0,0 +1,108 @@
+"""
+Cache Versions
+Bộ đếm phiên bản theo tên (menu, reservation, ...) để vô hiệu hóa cache trong process.
+Backend dùng chung (file/sqlite) giúp nhiều worker cùng thấy thay đổi.
+"""
+import os
+import sqlite3
+import threading
+import uuid
+from flask import current_app
+
+
+class LocalVersionStore:
+    """Chỉ trong process hiện tại (chạy 1 worker)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, name):
+        return self._versions.get(name, 0)
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+
+class FileVersionStore:
+    """Mỗi tên là 1 file chứa token phiên bản, ghi đè nguyên tử bằng os.replace"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'{name}.version')
+
+    def get(self, name):
+        try:
+            with open(self._path(name), encoding='utf-8') as f:
+                return f.read().strip() or 0
+        except FileNotFoundError:
+            return 0
+
+    def bump(self, name):
+        token = uuid.uuid4().hex
+        tmp_path = f'{self._path(name)}.{token}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(token)
+        os.replace(tmp_path, self._path(name))
+        return token
+
+
+class SqliteVersionStore:
+    """Bảng versions trong 1 file SQLite riêng, tăng nguyên tử bằng UPSERT"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, name):
+        row = self._connect().execute('SELECT version FROM versions WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, name):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO versions (name, version) VALUES (?, 1) '
+                'ON CONFLICT(name) DO UPDATE SET version = version + 1',
+                (name,)
+            )
+        return self.get(name)
+
+
+BACKENDS = {
+    'local': lambda app: LocalVersionStore(),
+    'file': lambda app: FileVersionStore(app.config['CACHE_VERSION_PATH']),
+    'sqlite': lambda app: SqliteVersionStore(os.path.join(app.config['CACHE_VERSION_PATH'], 'versions.db')),
+}
+
+
+def init_version_store(app):
+    """Tạo version store theo CACHE_VERSION_BACKEND (local, file, sqlite)"""
+    backend = app.config['CACHE_VERSION_BACKEND']
+    if backend not in BACKENDS:
+        raise ValueError(f'CACHE_VERSION_BACKEND không hợp lệ: {backend}')
+    app.extensions['version_store'] = BACKENDS[backend](app)
+
+
+def get_version(name):
+    return current_app.extensions['version_store'].get(name)
+
+
+def bump_version(name):
+    """Đánh dấu dữ liệu `name` đã thay đổi (gọi sau commit)"""
+    return current_app.extensions['version_store'].bump(name)